@@ -3,6 +3,8 @@
 # ADMIN PANEL FOR Y.I.T.I.O BOT
 # ===================================================
 
+import io
+import hmac
 import logging
 from datetime import datetime
 from typing import Optional
@@ -13,16 +15,19 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKe
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from shared import bot, dp, supabase, logger, ADMIN_ID, ADMIN_TOKEN
-from utils import extract_video_id, get_embed_url  # <-- Changed from main.py to utils.py
+from shared import bot, dp, logger, ADMIN_ID, ADMIN_TOKEN
+from repository import repo
+from utils import extract_video_id, get_embed_url, canonicalize_url
+from catalog import video_catalog
+from stats import stats_aggregator
+from bulk_import import import_videos, iter_lines, iter_text, detect_format, FORMATS, LineTooLongError
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
 class AdminUpload(StatesGroup):
     waiting_video_url = State()
     waiting_platform = State()
-
-PLATFORMS = ["YouTube", "TikTok", "Instagram"]
+    waiting_import = State()
 
 # ==================== ADMIN COMMANDS ====================
 
@@ -30,7 +35,8 @@ PLATFORMS = ["YouTube", "TikTok", "Instagram"]
 async def admin_cmd(message: Message, state: FSMContext):
     await state.clear()
     kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="📤 Add New Video", callback_data="add_video")]
+        [InlineKeyboardButton(text="📤 Add New Video", callback_data="add_video")],
+        [InlineKeyboardButton(text="📥 Bulk Import", callback_data="bulk_import")]
     ])
     await message.answer("<b>Admin Control Panel</b>", reply_markup=kb, parse_mode="HTML")
 
@@ -42,17 +48,22 @@ async def add_video_step1(call: CallbackQuery, state: FSMContext):
 
 @dp.message(AdminUpload.waiting_video_url)
 async def add_video_step2(message: Message, state: FSMContext):
-    if not supabase:
+    if not repo:
         await message.answer("❌ Database not connected. Cannot add video.")
         await state.clear()
         return
     
     url = message.text.strip()
     
-    # Check if URL already exists
-    existing = supabase.table('videos').select('*').eq('url', url).execute()
+    # Check if the video already exists, whatever URL form it was added with
+    key = canonicalize_url(url)
+    if key:
+        existing = await video_catalog.contains_canonical(key)
+    else:
+        # Unrecognized URL: fall back to an exact match in the database
+        existing = await repo.find_video_by_url(url) is not None
     
-    if existing.data:
+    if existing:
         await message.answer("❌ This video URL already exists in the database!")
         await state.clear()
         return
@@ -71,7 +82,7 @@ async def add_video_step2(message: Message, state: FSMContext):
 async def add_video_final(call: CallbackQuery, state: FSMContext):
     await call.answer()
     
-    if not supabase:
+    if not repo:
         await call.message.edit_text("❌ Database not connected. Cannot add video.")
         await state.clear()
         return
@@ -88,22 +99,29 @@ async def add_video_final(call: CallbackQuery, state: FSMContext):
         
         if is_service_role:
             # Service role should bypass RLS, but let's be explicit
-            response = supabase.table('videos').insert({
+            response = await repo.insert_video({
                 "url": url,
                 "platform": platform,
                 "embed_url": get_embed_url(url, platform),
                 "created_at": datetime.utcnow().isoformat()
-            }).execute()
+            })
         else:
             # If using anon key, we need RLS policy
             # Try with user context if available
-            response = supabase.table('videos').insert({
+            response = await repo.insert_video({
                 "url": url,
                 "platform": platform,
                 "embed_url": get_embed_url(url, platform),
                 "created_at": datetime.utcnow().isoformat(),
                 "uploaded_by": call.from_user.id if call.from_user else ADMIN_ID
-            }).execute()
+            })
+        
+        # Make the new video visible in /api/videos right away
+        video_catalog.invalidate()
+        key = canonicalize_url(url)
+        if key:
+            video_catalog.add_canonical(key)
+        stats_aggregator.record_video(platform)
         
         await call.message.edit_text(f"✅ Successfully added {platform} video!")
         await state.clear()
@@ -113,6 +131,47 @@ async def add_video_final(call: CallbackQuery, state: FSMContext):
         await call.message.edit_text(f"❌ Error adding video: {str(e)[:200]}")
         await state.clear()
 
+# ==================== BULK IMPORT ====================
+
+@dp.callback_query(F.from_user.id == ADMIN_ID, F.data == "bulk_import")
+async def bulk_import_step1(call: CallbackQuery, state: FSMContext):
+    await call.answer()
+    await call.message.edit_text(
+        "Send a list of video URLs, one per line, or upload a file:\n"
+        "• .txt - one URL per line\n"
+        "• .csv - a <code>url</code> column (optional <code>platform</code>)\n"
+        "• .jsonl - one <code>{\"url\": ...}</code> object per line",
+        parse_mode="HTML"
+    )
+    await state.set_state(AdminUpload.waiting_import)
+
+@dp.message(F.from_user.id == ADMIN_ID, AdminUpload.waiting_import)
+async def bulk_import_step2(message: Message, state: FSMContext):
+    if not repo:
+        await message.answer("❌ Database not connected. Cannot import videos.")
+        await state.clear()
+        return
+    
+    if message.document:
+        fmt = detect_format(message.document.file_name, message.document.mime_type)
+        buffer = await bot.download(message.document)
+        lines = iter_text(io.TextIOWrapper(buffer, encoding="utf-8", errors="replace"))
+    elif message.text:
+        fmt = "auto"
+        lines = iter_text(message.text.splitlines())
+    else:
+        await message.answer("❌ Please send URLs as text or as a .txt/.csv/.jsonl file.")
+        return
+    
+    await state.clear()
+    status = await message.answer("⏳ Importing...")
+    try:
+        summary = await import_videos(lines, fmt)
+        await status.edit_text(summary.to_text())
+    except Exception as e:
+        logger.error(f"Bulk import error: {e}")
+        await status.edit_text(f"❌ Import failed: {str(e)[:200]}")
+
 # Add a handler for when the user cancels or goes back
 @dp.callback_query(F.data == "cancel_upload")
 async def cancel_upload(call: CallbackQuery, state: FSMContext):
@@ -122,54 +181,57 @@ async def cancel_upload(call: CallbackQuery, state: FSMContext):
 
 # ==================== ADMIN API ENDPOINTS ====================
 
-@router.get("/stats")
-async def admin_stats(request: Request):
-    """Admin statistics endpoint"""
-    if not supabase:
-        raise HTTPException(status_code=500, detail="Database not connected")
+def _require_admin(request: Request):
+    """Simple auth check: Authorization: Bearer <ADMIN_TOKEN>
     
-    # Simple auth check
+    Without an ADMIN_TOKEN configured every request is refused.
+    """
     auth = request.headers.get("Authorization", "")
-    if not auth.startswith("Bearer "):
+    if not ADMIN_TOKEN or not auth.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Unauthorized")
     
-    token = auth.replace("Bearer ", "").strip()
-    if token != ADMIN_TOKEN:
+    token = auth[len("Bearer "):].strip()
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
         raise HTTPException(status_code=401, detail="Unauthorized")
+
+@router.get("/stats")
+async def admin_stats(request: Request):
+    """Admin statistics endpoint"""
+    if not repo:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    
+    _require_admin(request)
     
     try:
-        # Get total videos by platform
-        youtube_res = supabase.table("videos").select("count", count="exact").eq("platform", "YouTube").execute()
-        tiktok_res = supabase.table("videos").select("count", count="exact").eq("platform", "TikTok").execute()
-        instagram_res = supabase.table("videos").select("count", count="exact").eq("platform", "Instagram").execute()
-        
-        # Get total users
-        users_res = supabase.table("users").select("count", count="exact").execute()
-        total_users = users_res.count or 0
-        
-        # Get premium users
-        premium_res = supabase.table("users").select("count", count="exact").eq("is_premium", True).execute()
-        premium_users = premium_res.count or 0
-        
-        # Get total payments
-        payments_res = supabase.table("payments").select("amount", "currency").eq("status", "completed").execute()
-        total_revenue = sum(p.get("amount", 0) for p in payments_res.data) if payments_res.data else 0
-        
-        return {
-            "videos": {
-                "youtube": youtube_res.count or 0,
-                "tiktok": tiktok_res.count or 0,
-                "instagram": instagram_res.count or 0,
-                "total": (youtube_res.count or 0) + (tiktok_res.count or 0) + (instagram_res.count or 0)
-            },
-            "users": {
-                "total": total_users,
-                "premium": premium_users,
-                "premium_percentage": (premium_users / total_users * 100) if total_users > 0 else 0
-            },
-            "revenue": total_revenue
-        }
+        # Counters are kept current by our own writes and a periodic reconcile
+        return await stats_aggregator.snapshot()
         
     except Exception as e:
         logger.error(f"Admin stats error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/import")
+async def admin_import(request: Request, format: Optional[str] = None):
+    """Bulk video import; the request body is read as a stream
+
+    The format comes from ?format=csv|jsonl|plain or the Content-Type,
+    otherwise it is detected per line.
+    """
+    if not repo:
+        raise HTTPException(status_code=500, detail="Database not connected")
+    
+    _require_admin(request)
+    
+    fmt = format or detect_format(content_type=request.headers.get("Content-Type"))
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {fmt}")
+    
+    try:
+        summary = await import_videos(iter_lines(request.stream()), fmt)
+        return summary.to_dict()
+        
+    except LineTooLongError as e:
+        raise HTTPException(status_code=413, detail=f"Nothing imported: {e}")
+    except Exception as e:
+        logger.error(f"Admin import error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
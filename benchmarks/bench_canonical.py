@@ -0,0 +1,110 @@
+# ===================================================
+# FILE: benchmarks/bench_canonical.py
+# MICROBENCHMARK: URL CANONICALIZER VS LEGACY extract_video_id
+# ===================================================
+#
+# Usage: python benchmarks/bench_canonical.py [--n 20000]
+
+import os
+import sys
+import random
+import argparse
+import timeit
+
+# Add repository root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import canonicalize_url, canonicalize_urls
+
+def legacy_extract_video_id(url: str, platform: str) -> str:
+    """utils.extract_video_id as it was before the canonicalizer"""
+    try:
+        if platform == "YouTube":
+            if "youtube.com/shorts/" in url:
+                return url.split("shorts/")[1].split("?")[0]
+            elif "youtu.be/" in url:
+                return url.split("youtu.be/")[1].split("?")[0]
+            elif "v=" in url:
+                return url.split("v=")[1].split("&")[0]
+        elif platform == "TikTok":
+            if "tiktok.com/@" in url and "/video/" in url:
+                parts = url.split("/video/")
+                if len(parts) > 1:
+                    return parts[1].split("?")[0]
+            elif "vm.tiktok.com/" in url:
+                return url
+            elif "tiktok.com/" in url and "/video/" in url:
+                return url.split("/video/")[1].split("/")[0].split("?")[0]
+        elif platform == "Instagram":
+            if "instagram.com/reel/" in url:
+                return url.split("reel/")[1].split("/")[0].split("?")[0]
+            elif "instagram.com/p/" in url:
+                return url.split("p/")[1].split("/")[0].split("?")[0]
+    except:
+        pass
+    return ""
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-"
+
+def make_urls(n: int, seed: int = 1):
+    """Mixed realistic URL forms across the three platforms"""
+    rng = random.Random(seed)
+    urls = []
+    for _ in range(n):
+        yt = "".join(rng.choice(ALPHABET) for _ in range(11))
+        form = rng.randrange(6)
+        if form == 0:
+            urls.append((f"https://youtu.be/{yt}?si=abc", "YouTube"))
+        elif form == 1:
+            urls.append((f"https://www.youtube.com/shorts/{yt}", "YouTube"))
+        elif form == 2:
+            urls.append((f"https://www.youtube.com/watch?v={yt}&t=3", "YouTube"))
+        elif form == 3:
+            urls.append((f"https://www.tiktok.com/@user/video/{rng.randrange(10**18, 10**19)}?lang=en", "TikTok"))
+        elif form == 4:
+            urls.append((f"https://www.instagram.com/reel/{yt[:10]}/", "Instagram"))
+        else:
+            urls.append((f"https://example.com/{yt}", "YouTube"))
+    return urls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=20000, help="number of URLs")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    urls = make_urls(args.n)
+    plain = [u for u, _ in urls]
+    # Repeated lookups of a working set that fits in the LRU cache
+    hot = plain[:1000] * max(1, args.n // 1000)
+
+    def legacy():
+        for url, platform in urls:
+            legacy_extract_video_id(url, platform)
+
+    def cold():
+        canonicalize_url.cache_clear()
+        for url in plain:
+            canonicalize_url(url)
+
+    def warm():
+        for url in hot:
+            canonicalize_url(url)
+
+    def batch():
+        canonicalize_urls(hot)
+
+    warm()  # fill the cache for the warm runs
+    results = {
+        "legacy extract_video_id": min(timeit.repeat(legacy, number=1, repeat=args.repeat)),
+        "canonicalize_url (cold cache)": min(timeit.repeat(cold, number=1, repeat=args.repeat)),
+        "canonicalize_url (warm cache)": min(timeit.repeat(warm, number=1, repeat=args.repeat)),
+        "canonicalize_urls (batch, warm)": min(timeit.repeat(batch, number=1, repeat=args.repeat)),
+    }
+
+    print(f"{args.n} URLs, best of {args.repeat}")
+    for name, seconds in results.items():
+        print(f"  {name:<34} {seconds * 1000:8.2f} ms  {seconds / args.n * 1e9:8.0f} ns/url")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+# ===================================================
+# FILE: benchmarks/http_bench.py
+# IN-PROCESS HTTP BENCHMARK FOR THE FASTAPI APP
+# ===================================================
+#
+# Drives main.app directly over ASGI (no sockets on the serving side)
+# against local fakes of the Supabase REST API and the Telegram Bot API.
+#
+# Usage:
+#   python benchmarks/http_bench.py [--requests 2000] [--concurrency 50]
+#                                   [--db-latency-ms 5] [--sizes 100,1000,10000]
+#                                   [--only videos,webhook] [--out results.json]
+#
+# Results are printed and written as JSON (benchmarks/results/ by default)
+# so runs on different commits can be compared.
+
+import os
+import sys
+import json
+import time
+import hmac
+import random
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+BOT_TOKEN = "123456:BENCHMARK-TOKEN"
+ADMIN_TOKEN = "bench-admin-token"
+WEBHOOK_SECRET = "bench-secret"
+
+# ==================== FAKE SUPABASE (PostgREST) ====================
+
+def _compare(current, value: str):
+    """Order a row value against a filter literal (numbers numerically)"""
+    if isinstance(current, (int, float)) and not isinstance(current, bool):
+        return (current > float(value)) - (current < float(value))
+    current = str(current)
+    return (current > value) - (current < value)
+
+def _split_terms(group: str) -> list:
+    """Top-level terms of a logical group: "(a.gt.1,and(b.eq.2,c.gt.3))" -> 2 terms"""
+    terms, depth, start = [], 0, 0
+    body = group[1:-1]
+    for i, ch in enumerate(body):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            terms.append(body[start:i])
+            start = i + 1
+    terms.append(body[start:])
+    return terms
+
+def _match(row: dict, filters: dict) -> bool:
+    for column, expr in filters.items():
+        if column in ("or", "and"):
+            # Logical groups, nested ones included: or=(a.lt.x,and(b.eq.y,c.gt.z))
+            results = []
+            for term in _split_terms(expr):
+                if term.startswith(("or(", "and(")):
+                    name, _, group = term.partition("(")
+                    results.append(_match(row, {name: "(" + group}))
+                else:
+                    results.append(_match(row, dict([term.split(".", 1)])))
+            if not (any(results) if column == "or" else all(results)):
+                return False
+            continue
+        op, _, value = expr.partition(".")
+        value = value.strip('"')
+        current = row.get(column)
+        if op == "is":
+            if current is not None:
+                return False
+        elif op == "not":
+            if current is None:
+                return False
+        elif op == "eq":
+            rendered = ("true" if current else "false") if isinstance(current, bool) else str(current)
+            if rendered != value:
+                return False
+        elif op in ("gt", "gte", "lt", "lte"):
+            if current is None:
+                return False
+            c = _compare(current, value)
+            if not {"gt": c > 0, "gte": c >= 0, "lt": c < 0, "lte": c <= 0}[op]:
+                return False
+    return True
+
+class FakeSupabase:
+    """Deterministic in-memory table API with injected per-call latency"""
+
+    RESERVED = {"select", "order", "limit", "on_conflict"}
+
+    def __init__(self, latency: float, seed: int = 1):
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.tables = {"videos": [], "users": [], "payments": [], "user_seen": []}
+        # (table, column) -> {value: [rows]}, so the fake's own cost stays negligible
+        self._indexes = {}
+        self.calls = 0
+
+    def _rows(self, table: str, filters: dict) -> list:
+        rows = self.tables.setdefault(table, [])
+        if len(filters) == 1:
+            column, expr = next(iter(filters.items()))
+            if expr.startswith("eq."):
+                index = self._indexes.get((table, column))
+                if index is None:
+                    index = self._indexes[(table, column)] = {}
+                    for row in rows:
+                        value = row.get(column)
+                        key = ("true" if value else "false") if isinstance(value, bool) else str(value)
+                        index.setdefault(key, []).append(row)
+                return list(index.get(expr[3:], []))
+        return [r for r in rows if _match(r, filters)]
+
+    def seed_videos(self, n: int):
+        start = datetime(2024, 1, 1)
+        alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-"
+        rows = []
+        for i in range(1, n + 1):
+            yt = "".join(self.rng.choice(alphabet) for _ in range(11))
+            rows.append({
+                "id": i,
+                "url": f"https://youtube.com/shorts/{yt}",
+                "platform": "YouTube",
+                "embed_url": f"https://www.youtube.com/embed/{yt}?autoplay=1",
+                "views": self.rng.randrange(0, 100000),
+                "created_at": (start + timedelta(minutes=i)).isoformat()
+            })
+        self.tables["videos"] = rows
+        self._indexes.clear()
+
+    def seed_users(self, n: int):
+        expires = (datetime.utcnow() + timedelta(days=10)).isoformat()
+        self.tables["users"] = [
+            {"telegram_id": i, "is_premium": i % 4 == 0, "premium_expires_at": expires if i % 4 == 0 else None}
+            for i in range(1, n + 1)
+        ]
+        self.tables["payments"] = [
+            {"telegram_id": i, "amount": 100, "currency": "XTR", "status": "completed"}
+            for i in range(1, n + 1, 4)
+        ]
+        self._indexes.clear()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        table = request.match_info["table"]
+        rows = self.tables.setdefault(table, [])
+        params = dict(request.query)
+        filters = {k: v for k, v in params.items() if k not in self.RESERVED}
+
+        if request.method in ("GET", "HEAD"):
+            if "(" in params.get("select", ""):
+                # Aggregates are disabled by default in PostgREST
+                return web.json_response({"message": "Use of aggregate functions is not allowed"}, status=400)
+            result = self._rows(table, filters)
+            if request.method == "HEAD":
+                return web.Response(headers={"Content-Range": f"*/{len(result)}"})
+            for part in reversed(params.get("order", "").split(",")):
+                if part:
+                    column, _, direction = part.partition(".")
+                    result.sort(key=lambda r: (r.get(column) is None, r.get(column) or 0),
+                                reverse=direction == "desc")
+            if "limit" in params:
+                result = result[:int(params["limit"])]
+            columns = params.get("select", "*")
+            if columns != "*":
+                names = columns.split(",")
+                result = [{c: r.get(c) for c in names} for r in result]
+            return web.json_response(result)
+
+        if request.method == "POST":
+            body = await request.json()
+            new_rows = body if isinstance(body, list) else [body]
+            key = params.get("on_conflict")
+            for row in new_rows:
+                existing = next((r for r in rows if key and r.get(key) == row.get(key)), None)
+                if existing is not None:
+                    existing.update(row)
+                else:
+                    if "id" not in row and table == "videos":
+                        row = {"id": len(rows) + 1, **row}
+                    rows.append(row)
+            self._indexes = {k: v for k, v in self._indexes.items() if k[0] != table}
+            return web.json_response(new_rows, status=201)
+
+        if request.method == "PATCH":
+            values = await request.json()
+            updated = self._rows(table, filters)
+            for row in updated:
+                row.update(values)
+            self._indexes = {k: v for k, v in self._indexes.items() if k[0] != table}
+            columns = params.get("select", "*")
+            if columns != "*":
+                names = columns.split(",")
+                updated = [{c: r.get(c) for c in names} for r in updated]
+            return web.json_response(updated)
+
+        return web.json_response({"message": "unsupported"}, status=405)
+
+# ==================== FAKE TELEGRAM BOT API ====================
+
+class FakeTelegram:
+    """Answers every Bot API method with a minimal valid result"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        method = request.match_info["method"].lower()
+        if method.startswith(("send", "edit")):
+            result = {"message_id": self.calls, "date": int(time.time()),
+                      "chat": {"id": 1, "type": "private"}, "text": ""}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "healthy"})
+
+async def start_fakes(db_latency: float):
+    supabase = FakeSupabase(db_latency)
+    telegram = FakeTelegram()
+    app = web.Application()
+    app.router.add_route("*", "/rest/v1/{table}", supabase.handle)
+    app.router.add_route("*", "/bot{token}/{method}", telegram.handle)
+    app.router.add_get("/health", telegram.health)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", supabase, telegram
+
+# ==================== ASGI DRIVER ====================
+
+async def asgi_request(app, method: str, path: str, query: str = "", headers: dict = None,
+                       body: bytes = b""):
+    """One request straight into the ASGI app; returns (status, body)"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80)
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # like a client that stays connected
+
+    status, chunks = 0, []
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+def sign_init_data(user_id: int) -> str:
+    fields = {"auth_date": str(int(time.time())), "query_id": f"q{user_id}",
+              "user": json.dumps({"id": user_id, "first_name": f"User{user_id}"}, separators=(",", ":"))}
+    secret = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+    check = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    fields["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+async def run_load(app, name: str, make_request, total: int, concurrency: int) -> dict:
+    """Fire `total` requests from `concurrency` workers and summarize latencies"""
+    latencies, errors = [], 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            i = total - remaining
+            method, path, query, headers, body, expected = make_request(i)
+            started = time.perf_counter()
+            status, _ = await asgi_request(app, method, path, query, headers, body)
+            latencies.append(time.perf_counter() - started)
+            if status not in expected:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3)
+    }
+    print(f"  {name:<34} {result['rps']:>9} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+          f"p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  errors {errors}")
+    return result
+
+# ==================== RECORDED UPDATES ====================
+
+def _message(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": int(time.time()), "text": text,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+        }
+    }
+
+def _callback(update_id: int, user_id: int, data: str) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id), "chat_instance": "bench", "data": data,
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "message": {"message_id": 1, "date": int(time.time()), "text": "menu",
+                        "chat": {"id": user_id, "type": "private"}}
+        }
+    }
+
+RECORDED_UPDATES = [
+    lambda uid, user: _message(uid, user, "/start"),
+    lambda uid, user: _message(uid, user, "/premium"),
+    lambda uid, user: _callback(uid, user, "get_premium"),
+]
+
+# ==================== MAIN ====================
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+async def main_async(args):
+    runner, base_url, supabase, telegram = await start_fakes(args.db_latency_ms / 1000)
+
+    # Configure the app before it is imported (settings are read at import time)
+    run_dir = tempfile.mkdtemp(prefix="yitio-bench-")
+    os.environ.update({
+        "BOT_TOKEN": BOT_TOKEN, "ADMIN_TOKEN": ADMIN_TOKEN, "ADMIN_ID": "1",
+        "SUPABASE_URL": base_url, "SUPABASE_KEY": "bench-key",
+        "WEBHOOK_SECRET_TOKEN": WEBHOOK_SECRET, "WEBHOOK_URL": f"{base_url}/api/telegram-webhook",
+        "WEBHOOK_MODE": args.webhook_mode, "DISABLE_PINGER": "true",
+        # A fresh replica per run, so no marks from an earlier dataset survive
+        "REPLICA_PATH": os.path.join(run_dir, "replica.sqlite3"),
+        "FSM_STORAGE_PATH": os.path.join(run_dir, "fsm.sqlite3"),
+        "LEADER_LOCK_PATH": os.path.join(run_dir, "leader.lock"),
+        # The load comes from a handful of users, which a real deployment would throttle
+        "RATE_LIMIT_ENABLED": "true" if args.rate_limit else "false"
+    })
+    supabase.seed_users(args.users)
+    import logging
+    logging.disable(logging.WARNING)
+
+    from aiogram.client.telegram import TelegramAPIServer
+    import main
+    from shared import bot
+    from catalog import video_catalog
+    from replica import read_replica
+    bot.session.api = TelegramAPIServer.from_base(base_url)
+
+    app = main.app
+    await main.startup_event()
+    if main._warmup_task:
+        await main._warmup_task
+
+    users = list(range(1, args.users + 1))
+    init_data = {u: sign_init_data(u) for u in users[:1000]}
+    only = set(args.only.split(",")) if args.only else None
+    results = []
+
+    print(f"commit {git_commit()}, {args.requests} requests x {args.concurrency} concurrent, "
+          f"db latency {args.db_latency_ms} ms")
+
+    if not only or "videos" in only:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            supabase.seed_videos(size)
+            await read_replica.sync(full=True)
+            video_catalog.invalidate()
+            for fmt in args.formats.split(","):
+                results.append(await run_load(app, f"/api/videos (catalog {size}, {fmt})", lambda i: (
+                    "GET", "/api/videos", f"category=YouTube&limit=30&cursor=&format={fmt}",
+                    {"X-Telegram-Init-Data": init_data[users[i % len(init_data)]]}, b"", (200,)
+                ), args.requests, args.concurrency))
+
+    if not only or "premium" in only:
+        results.append(await run_load(app, "/api/check-premium", lambda i: (
+            "GET", "/api/check-premium", "",
+            {"X-Telegram-Init-Data": init_data[users[i % len(init_data)]]}, b"", (200,)
+        ), args.requests, args.concurrency))
+
+    if not only or "user-data" in only:
+        results.append(await run_load(app, "/api/user-data", lambda i: (
+            "GET", "/api/user-data", "",
+            {"X-Telegram-Init-Data": init_data[users[i % len(init_data)]]}, b"", (200,)
+        ), args.requests, args.concurrency))
+
+    if not only or "webhook" in only:
+        def webhook_request(i):
+            update = RECORDED_UPDATES[i % len(RECORDED_UPDATES)](10_000_000 + i, users[i % len(users)])
+            return ("POST", "/webhook", "", {"Content-Type": "application/json",
+                                             "X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET},
+                    json.dumps(update).encode(), (200,))
+        results.append(await run_load(app, f"/webhook ({args.webhook_mode})", webhook_request,
+                                      args.requests, args.concurrency))
+
+    if not only or "admin" in only:
+        results.append(await run_load(app, "/api/admin/stats", lambda i: (
+            "GET", "/api/admin/stats", "", {"Authorization": f"Bearer {ADMIN_TOKEN}"}, b"", (200,)
+        ), args.requests, args.concurrency))
+
+    await main.shutdown_event()
+    await runner.cleanup()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {
+            "requests": args.requests, "concurrency": args.concurrency,
+            "db_latency_ms": args.db_latency_ms, "users": args.users,
+            "webhook_mode": args.webhook_mode
+        },
+        "fake_calls": {"supabase": supabase.calls, "telegram": telegram.calls},
+        "results": results
+    }
+    out = args.out or os.path.join(ROOT, "benchmarks", "results",
+                                   f"http-{report['commit']}-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out}")
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process HTTP benchmark for main.app")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="injected Supabase latency")
+    parser.add_argument("--sizes", default="100,1000,10000", help="catalog sizes for /api/videos")
+    parser.add_argument("--formats", default="full", help="comma list of /api/videos formats: full,compact,columnar")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--webhook-mode", default="inline", choices=["inline", "queue"])
+    parser.add_argument("--rate-limit", action="store_true", help="keep per-user rate limiting on")
+    parser.add_argument("--only", default="", help="comma list: videos,premium,user-data,webhook,admin")
+    parser.add_argument("--out", default="", help="JSON output path")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
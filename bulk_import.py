@@ -0,0 +1,219 @@
+# ===================================================
+# FILE: bulk_import.py
+# BULK VIDEO IMPORT FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import csv
+import json
+from datetime import datetime, timedelta
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Optional, Tuple
+
+from shared import logger
+from repository import repo
+from utils import canonicalize_url, get_embed_url
+from catalog import video_catalog
+from stats import stats_aggregator
+
+# Rows sent per multi-row insert
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+# Lines read from one import before the rest is ignored
+IMPORT_MAX_ROWS = int(os.environ.get("IMPORT_MAX_ROWS", 20000))
+# Longest accepted input line; a longer one rejects the whole upload
+IMPORT_MAX_LINE_BYTES = int(os.environ.get("IMPORT_MAX_LINE_BYTES", 4096))
+# Rejected lines listed individually in the summary
+IMPORT_MAX_ERRORS = 20
+
+FORMATS = ("auto", "csv", "jsonl", "plain")
+
+def detect_format(filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """Input format from a file name or content type ("auto" if unknown)"""
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith(".csv") or "csv" in ctype:
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")) or "ndjson" in ctype or "jsonl" in ctype or "json-lines" in ctype:
+        return "jsonl"
+    if name.endswith(".txt") or ctype.startswith("text/plain"):
+        return "plain"
+    return "auto"
+
+class LineTooLongError(ValueError):
+    """An input line is longer than IMPORT_MAX_LINE_BYTES"""
+
+    def __init__(self, line_no: int):
+        super().__init__(f"line {line_no} is longer than {IMPORT_MAX_LINE_BYTES} bytes")
+        self.line_no = line_no
+
+# ==================== PARSING ====================
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without reading it all first
+
+    Raises LineTooLongError rather than buffering an endless line.
+    """
+    buffer = b""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if len(line) > IMPORT_MAX_LINE_BYTES:
+                raise LineTooLongError(line_no)
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            raise LineTooLongError(line_no + 1)
+    if buffer:
+        yield buffer.decode("utf-8", errors="replace").rstrip("\r")
+
+async def iter_text(lines: Iterable[str]) -> AsyncIterator[str]:
+    """Async view of lines already in memory (pasted text, small files)"""
+    for line in lines:
+        yield line
+
+async def parse_rows(lines: AsyncIterable[str], fmt: str = "auto") -> AsyncIterator[Tuple[int, Optional[str], Optional[str]]]:
+    """Yield (line_number, url, platform) per input line; url is None if unreadable
+
+    csv:   header row with a "url" column (and optionally "platform"), or
+           headerless rows with the URL in the first column
+    jsonl: one {"url": ..., "platform": ...} object per line
+    plain: one URL per line
+    auto:  decided per line ("{" -> jsonl, "," -> csv, else plain)
+    """
+    url_col, platform_col = 0, None
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if len(line) > IMPORT_MAX_LINE_BYTES:
+            raise LineTooLongError(line_no)
+        text = line.strip()
+        if not text or text.startswith("#"):
+            continue
+
+        kind = fmt
+        if kind == "auto":
+            kind = "jsonl" if text.startswith("{") else "csv" if "," in text else "plain"
+
+        if kind == "jsonl":
+            try:
+                obj = json.loads(text)
+                yield line_no, str(obj["url"]), obj.get("platform")
+            except (ValueError, KeyError, TypeError):
+                yield line_no, None, None
+        elif kind == "csv":
+            cells = [c.strip() for c in next(csv.reader([text]))]
+            header = [c.lower() for c in cells]
+            if "url" in header:
+                # Header row: remember where the columns are
+                url_col = header.index("url")
+                platform_col = header.index("platform") if "platform" in header else None
+                continue
+            url = cells[url_col] if url_col < len(cells) else None
+            platform = cells[platform_col] if platform_col is not None and platform_col < len(cells) else None
+            yield line_no, url or None, platform or None
+        else:
+            yield line_no, text, None
+
+# ==================== IMPORT ====================
+
+class ImportSummary:
+    """Counts of what happened to each input row"""
+
+    def __init__(self):
+        self.accepted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.failed = 0
+        self.truncated = False
+        self.errors: List[dict] = []
+
+    def reject(self, line_no: int, reason: str):
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line_no, "reason": reason})
+
+    def to_dict(self) -> dict:
+        return {
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "failed": self.failed,
+            "truncated": self.truncated,
+            "errors": self.errors
+        }
+
+    def to_text(self) -> str:
+        text = (f"✅ Imported: {self.accepted}\n"
+                f"♻️ Duplicates: {self.duplicates}\n"
+                f"⚠️ Invalid: {self.invalid}")
+        if self.failed:
+            text += f"\n❌ Failed to insert: {self.failed}"
+        if self.truncated:
+            text += f"\n✂️ Stopped after {IMPORT_MAX_ROWS} lines"
+        for error in self.errors[:5]:
+            text += f"\n• line {error['line']}: {error['reason']}"
+        return text
+
+async def import_videos(lines: AsyncIterable[str], fmt: str = "auto") -> ImportSummary:
+    """Canonicalize, dedupe and insert videos in batched multi-row calls
+
+    Duplicates are found in memory, against the catalog's canonical-id
+    index and against earlier rows of the same import. The whole input is
+    validated before the first insert, so a LineTooLongError leaves the
+    database untouched. Rows get distinct, increasing created_at values in
+    input order, so they never tie in keyset paging or recency ranking.
+    """
+    summary = ImportSummary()
+    await video_catalog.get_videos()  # make sure the canonical index is loaded
+    seen = set()
+    pending: List[Tuple[dict, Tuple[str, str]]] = []
+
+    rows = 0
+    async for line_no, url, platform in parse_rows(lines, fmt):
+        rows += 1
+        if rows > IMPORT_MAX_ROWS:
+            summary.truncated = True
+            break
+
+        key = canonicalize_url(url) if url else None
+        if key is None:
+            summary.invalid += 1
+            summary.reject(line_no, "unrecognized URL")
+            continue
+        if platform and platform.lower() != key[0].lower():
+            summary.invalid += 1
+            summary.reject(line_no, f"URL is {key[0]}, not {platform}")
+            continue
+        if key in seen or video_catalog.has_canonical(key):
+            summary.duplicates += 1
+            continue
+
+        seen.add(key)
+        pending.append(({
+            "url": url.strip(),
+            "platform": key[0],
+            "embed_url": get_embed_url(url.strip(), key[0])
+        }, key))
+
+    started = datetime.utcnow()
+    for i, (row, _) in enumerate(pending):
+        row["created_at"] = (started + timedelta(microseconds=i)).isoformat(timespec="microseconds")
+
+    for start in range(0, len(pending), IMPORT_BATCH_SIZE):
+        chunk = pending[start:start + IMPORT_BATCH_SIZE]
+        try:
+            await repo.insert("videos", [row for row, _ in chunk])
+        except Exception as e:
+            logger.error(f"❌ Bulk import batch of {len(chunk)} failed: {e}")
+            summary.failed += len(chunk)
+            continue
+        summary.accepted += len(chunk)
+        for _, key in chunk:
+            video_catalog.add_canonical(key)
+            stats_aggregator.record_video(key[0])
+
+    if summary.accepted:
+        # Make the new videos visible in /api/videos right away
+        video_catalog.invalidate()
+    logger.info(f"📥 Bulk import: {summary.to_dict()}")
+    return summary
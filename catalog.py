@@ -0,0 +1,231 @@
+# ===================================================
+# FILE: catalog.py
+# IN-MEMORY VIDEO CATALOG FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import json
+import time
+import zlib
+import base64
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from shared import logger
+from replica import read_replica
+from ranking import RankedFeed, get_strategy
+from utils import canonicalize_url, canonicalize_urls
+
+# Largest page /api/videos will return, whatever the client asks for
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 50))
+
+# How long a loaded catalog is served before it is refreshed from Supabase
+CATALOG_TTL_SECONDS = float(os.environ.get("CATALOG_TTL_SECONDS", 60))
+REFRESH_RETRY_SECONDS = 5
+
+# /api/videos payload formats: stored rows, projected rows, or parallel arrays
+FEED_FORMATS = ("full", "compact", "columnar")
+# What the mini app reads from a video (video_id is derived from the URL)
+COMPACT_FIELDS = ("id", "platform", "url", "video_id", "created_at")
+
+def sort_key(row: dict) -> tuple:
+    """Catalog position of a video: (created_at, id)"""
+    return (row.get('created_at') or "", row.get('id') or 0)
+
+def compact_row(row: dict, key: Optional[Tuple[str, str]]) -> dict:
+    """Projection of a stored row for the compact formats; `key` is its canonical (platform, id)"""
+    video_id = key[1] if key else None
+    if video_id and video_id.startswith("short:"):
+        # Unresolved TikTok short link: only the URL identifies it
+        video_id = None
+    return {
+        "id": row.get("id"),
+        "platform": row.get("platform"),
+        "url": row.get("url"),
+        "video_id": video_id,
+        "created_at": row.get("created_at")
+    }
+
+def encode_cursor(key: tuple) -> str:
+    """Opaque, URL-safe cursor for a feed position (score, id)"""
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Optional[tuple]:
+    """Inverse of encode_cursor; an empty cursor means the first page"""
+    if not cursor:
+        return None
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    score, video_id = json.loads(raw)
+    return (float(score), video_id)
+
+class VideoCatalog:
+    """Shared in-memory copy of the videos table, grouped by platform"""
+
+    def __init__(self, ttl_seconds: float = CATALOG_TTL_SECONDS):
+        self.ttl = ttl_seconds
+        self._all: List[dict] = []
+        self._by_platform: Dict[str, List[dict]] = {}
+        self.strategy = get_strategy()
+        # Ranked orders per category, built on first use after each refresh
+        self._ranked: Dict[str, RankedFeed] = {}
+        # (platform, canonical_id) of every video, for duplicate checks
+        self._canonical: Set[Tuple[str, str]] = set()
+        # Largest numeric video id loaded (bounds ids clients may report as seen)
+        self.max_id = 0
+        # video id -> compact projection, built once per refresh
+        self._compact: Dict[int, dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._generation = 0
+        # Checksum of the loaded rows; changes whenever any video does (for ETags)
+        self.version = "0"
+        self._lock = asyncio.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.invalidations = 0
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and (time.monotonic() - self._loaded_at) < self.ttl
+
+    def invalidate(self):
+        """Drop the loaded catalog so the next request reloads it"""
+        self._loaded_at = None
+        self._generation += 1
+        self.invalidations += 1
+
+    async def refresh(self):
+        """Reload every video (local replica if fresh, else Supabase), newest first"""
+        generation = self._generation
+        rows = await read_replica.list_videos()
+        # Break created_at ties by id so the keyset order is total
+        rows.sort(key=sort_key, reverse=True)
+
+        by_platform: Dict[str, List[dict]] = {}
+        for row in rows:
+            by_platform.setdefault(row.get('platform'), []).append(row)
+
+        self._all = rows
+        self._by_platform = by_platform
+        self._ranked = {}
+        keys = canonicalize_urls(r.get('url') or "" for r in rows)
+        self._canonical = {k for k in keys if k}
+        self._compact = {r.get('id'): compact_row(r, k) for r, k in zip(rows, keys)}
+        self.max_id = max((r['id'] for r in rows if isinstance(r.get('id'), int)), default=0)
+        content = json.dumps(rows, sort_keys=True, separators=(",", ":"), default=str).encode()
+        self.version = f"{len(rows)}-{zlib.crc32(content):08x}"
+        # An insert that landed mid-refresh keeps the catalog stale
+        if generation == self._generation:
+            self._loaded_at = time.monotonic()
+        self.refreshes += 1
+        logger.info(f"📚 Video catalog refreshed: {len(rows)} videos")
+
+    async def get_videos(self, category: str = "All") -> List[dict]:
+        """Return the catalog for a platform ("All" for every platform), newest first"""
+        if self._is_fresh():
+            self.hits += 1
+        else:
+            self.misses += 1
+            async with self._lock:
+                # Another request may have refreshed while we waited
+                if not self._is_fresh():
+                    try:
+                        await self.refresh()
+                    except Exception as e:
+                        self.refresh_errors += 1
+                        # Serve the previous copy if we have one
+                        if self.refreshes == 0:
+                            raise
+                        logger.error(f"❌ Video catalog refresh failed, serving stale copy: {e}")
+                        # Retry shortly instead of on every request
+                        self._loaded_at = time.monotonic() - self.ttl + REFRESH_RETRY_SECONDS
+
+        if category.lower() == "all":
+            return self._all
+        return self._by_platform.get(category, [])
+
+    async def get_page(self, category: str, after: Optional[tuple], limit: int,
+                       bucket: int = 0, exclude=None) -> Tuple[List[dict], Optional[tuple]]:
+        """Return up to `limit` ranked videos after the feed position `after`,
+        plus the position to continue from (None when the catalog is exhausted).
+        Videos in the `exclude` seen-set are skipped."""
+        rows = await self.get_videos(category)
+        key = "all" if category.lower() == "all" else category
+
+        ranked = self._ranked.get(key)
+        if ranked is None or ranked.rows is not rows:
+            ranked = RankedFeed(rows, self.strategy)
+            self._ranked[key] = ranked
+
+        return ranked.page(bucket, after, limit, exclude)
+
+    async def get_since(self, category: str, since: str, limit: int) -> Tuple[List[dict], bool]:
+        """Videos created after `since` (a created_at from an earlier response),
+        newest first, plus whether more than `limit` of them exist"""
+        rows = await self.get_videos(category)
+        # Rows are sorted newest first, so the new ones are a prefix
+        new = []
+        for row in rows:
+            if (row.get('created_at') or "") <= since:
+                break
+            if len(new) == limit:
+                return new, True
+            new.append(row)
+        return new, False
+
+    def project(self, rows: List[dict], fmt: str = "full") -> Union[List[dict], Dict[str, list]]:
+        """Rows of a page in one of FEED_FORMATS
+
+        "full" is the stored rows, "compact" keeps COMPACT_FIELDS only and
+        "columnar" turns those into one array per field.
+        """
+        if fmt == "full":
+            return rows
+        compact = []
+        for row in rows:
+            projected = self._compact.get(row.get('id'))
+            if projected is None:
+                # Inserted after the last refresh
+                projected = compact_row(row, canonicalize_url(row.get('url') or ""))
+            compact.append(projected)
+        if fmt == "compact":
+            return compact
+        return {field: [c[field] for c in compact] for field in COMPACT_FIELDS}
+
+    async def contains_canonical(self, key: Tuple[str, str]) -> bool:
+        """Is a video with this (platform, canonical_id) already in the catalog?"""
+        await self.get_videos()
+        return self.has_canonical(key)
+
+    def has_canonical(self, key: Tuple[str, str]) -> bool:
+        """Same check against whatever is loaded now, without refreshing"""
+        return key in self._canonical
+
+    def add_canonical(self, key: Tuple[str, str]):
+        """Record a video we just inserted, ahead of the next refresh"""
+        self._canonical.add(key)
+
+    def stats(self) -> dict:
+        """Hit/miss/refresh counters for monitoring"""
+        total = self.hits + self.misses
+        return {
+            "videos": len(self._all),
+            "canonical_ids": len(self._canonical),
+            "version": self.version,
+            "platforms": {p: len(v) for p, v in self._by_platform.items()},
+            "fresh": self._is_fresh(),
+            "ttl_seconds": self.ttl,
+            "ranking": self.strategy.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "invalidations": self.invalidations
+        }
+
+# Global catalog instance
+video_catalog = VideoCatalog()
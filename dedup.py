@@ -0,0 +1,144 @@
+# ===================================================
+# FILE: dedup.py
+# DUPLICATE TELEGRAM UPDATE FILTER FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+from array import array
+from typing import Optional
+
+from leader import WEB_CONCURRENCY
+
+logger = logging.getLogger("yitio_bot")
+
+# Number of most recent update_ids remembered
+UPDATE_DEDUP_WINDOW = int(os.environ.get("UPDATE_DEDUP_WINDOW", 10000))
+# SQLite file shared by the worker processes when WEB_CONCURRENCY > 1
+UPDATE_DEDUP_PATH = os.environ.get("UPDATE_DEDUP_PATH", os.path.join(tempfile.gettempdir(), "yitio_dedup.sqlite3"))
+# Claims between two prunes of ids that fell out of the window
+UPDATE_DEDUP_PRUNE_EVERY = 500
+
+_EMPTY = -1
+
+class UpdateDeduplicator:
+    """Remembers the last N update_ids to drop Telegram redeliveries
+
+    A fixed ring buffer (int64 array) gives the eviction order and a set gives
+    O(1) lookups; memory stays bounded at `size` ids.
+    """
+
+    def __init__(self, size: int = UPDATE_DEDUP_WINDOW):
+        self.size = max(1, size)
+        self._ring = array('q', [_EMPTY]) * self.size
+        self._pos = 0
+        self._seen = set()
+
+        # Counters
+        self.checked = 0
+        self.duplicates = 0
+
+    def check_and_add(self, update_id: int) -> bool:
+        """Return True for a new update_id (and remember it), False for a duplicate"""
+        self.checked += 1
+        if update_id in self._seen:
+            self.duplicates += 1
+            return False
+
+        evicted = self._ring[self._pos]
+        if evicted != _EMPTY:
+            self._seen.discard(evicted)
+        self._ring[self._pos] = update_id
+        self._pos = (self._pos + 1) % self.size
+        self._seen.add(update_id)
+        return True
+
+    def forget(self, update_id: int):
+        """Undo check_and_add, e.g. when the update was rejected and will be redelivered"""
+        self._seen.discard(update_id)
+        last = (self._pos - 1) % self.size
+        if self._ring[last] == update_id:
+            self._ring[last] = _EMPTY
+
+    def stats(self) -> dict:
+        return {
+            "window": self.size,
+            "tracked": len(self._seen),
+            "checked": self.checked,
+            "duplicates_dropped": self.duplicates
+        }
+
+class SharedUpdateDeduplicator:
+    """UpdateDeduplicator for several worker processes, in one SQLite (WAL) file
+
+    Telegram may redeliver an update to any worker, so a per-process window
+    would let two workers both run e.g. on_successful_payment. Here a worker
+    claims an update_id with INSERT OR IGNORE, which exactly one process can
+    win. Update ids are sequential, so ids more than `size` below the newest
+    are pruned. A local window in front answers this worker's own repeats
+    without touching the file, and keeps filtering if SQLite fails.
+    """
+
+    def __init__(self, path: str = UPDATE_DEDUP_PATH, size: int = UPDATE_DEDUP_WINDOW):
+        self.path = path
+        self.size = max(1, size)
+        self._local = UpdateDeduplicator(size)
+        self._db: Optional[sqlite3.Connection] = None
+        self._claims = 0
+
+        # Counters
+        self.errors = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS updates (update_id INTEGER PRIMARY KEY, seen_at REAL NOT NULL)"
+            )
+        return self._db
+
+    def check_and_add(self, update_id: int) -> bool:
+        """Return True if this process claimed update_id, False if any worker already did"""
+        if not self._local.check_and_add(update_id):
+            return False
+        try:
+            db = self._conn()
+            claimed = db.execute(
+                "INSERT OR IGNORE INTO updates (update_id, seen_at) VALUES (?, ?)", (update_id, time.time())
+            ).rowcount == 1
+            self._claims += 1
+            if self._claims % UPDATE_DEDUP_PRUNE_EVERY == 0:
+                db.execute("DELETE FROM updates WHERE update_id <= (SELECT MAX(update_id) FROM updates) - ?",
+                           (self.size,))
+        except sqlite3.Error as e:
+            # Fall back to this worker's own window rather than drop the update
+            self.errors += 1
+            logger.error(f"❌ Shared update dedup failed: {e}")
+            return True
+        if not claimed:
+            self._local.duplicates += 1
+        return claimed
+
+    def forget(self, update_id: int):
+        """Release the claim so the redelivery can be handled by any worker"""
+        self._local.forget(update_id)
+        try:
+            self._conn().execute("DELETE FROM updates WHERE update_id = ?", (update_id,))
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.error(f"❌ Shared update dedup failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            **self._local.stats(),
+            "backend": "sqlite",
+            "errors": self.errors
+        }
+
+# Global filter used by the webhook endpoints; shared once there are several workers
+update_dedup = SharedUpdateDeduplicator() if WEB_CONCURRENCY > 1 else UpdateDeduplicator()
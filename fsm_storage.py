@@ -0,0 +1,176 @@
+# ===================================================
+# FILE: fsm_storage.py
+# PERSISTENT FSM STORAGE FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import tempfile
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+
+logger = logging.getLogger("yitio_bot")
+
+FSM_STORAGE_PATH = os.environ.get("FSM_STORAGE_PATH", os.path.join(tempfile.gettempdir(), "yitio_fsm.sqlite3"))
+# Abandoned conversations (no state/data write for this long) are forgotten
+FSM_STATE_TTL_SECONDS = float(os.environ.get("FSM_STATE_TTL_SECONDS", 86400))
+# Writes are buffered this long so a handler's set_state + update_data
+# land in one transaction
+FSM_FLUSH_DELAY_SECONDS = float(os.environ.get("FSM_FLUSH_DELAY_SECONDS", 0.05))
+FSM_PURGE_SECONDS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fsm_expires ON fsm (expires_at);
+"""
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+class SQLiteStorage(BaseStorage):
+    """aiogram FSM storage in SQLite (WAL), shareable by several worker processes
+
+    Writes go to an in-memory pending map first (reads check it before the
+    database) and are flushed together shortly after, in one transaction.
+    A Telegram user can't send their next message within the flush delay,
+    so another worker handling it sees the committed state.
+    """
+
+    def __init__(self, path: str = FSM_STORAGE_PATH, ttl: float = FSM_STATE_TTL_SECONDS,
+                 flush_delay: float = FSM_FLUSH_DELAY_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.flush_delay = flush_delay
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._db: Optional[sqlite3.Connection] = None
+        # key -> (state, data) not yet written to SQLite
+        self._pending: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._purged_at = 0.0
+
+        # Counters
+        self.flushes = 0
+        self.rows_written = 0
+        self.purged = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    # ==================== READ/WRITE ====================
+
+    def _load(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending
+        row = self._conn().execute(
+            "SELECT state, data FROM fsm WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None, {}
+        return row[0], json.loads(row[1]) if row[1] else {}
+
+    def _store(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        self._pending[key] = (state, data)
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.flush_delay, self.flush)
+
+    def flush(self):
+        """Write every pending key in one transaction"""
+        self._flush_handle = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        upserts = [(k, s, json.dumps(d, default=str), now + self.ttl) for k, (s, d) in pending.items() if s or d]
+        deletes = [(k,) for k, (s, d) in pending.items() if not s and not d]
+        db = self._conn()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany("INSERT OR REPLACE INTO fsm (key, state, data, expires_at) VALUES (?, ?, ?, ?)", upserts)
+            db.executemany("DELETE FROM fsm WHERE key = ?", deletes)
+            if now - self._purged_at > FSM_PURGE_SECONDS:
+                self.purged += db.execute("DELETE FROM fsm WHERE expires_at <= ?", (now,)).rowcount
+                self._purged_at = now
+            db.execute("COMMIT")
+        except sqlite3.Error as e:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            logger.error(f"❌ FSM storage flush failed, retrying: {e}")
+            # Keep newer writes made since, retry the rest shortly
+            for key, value in pending.items():
+                self._pending.setdefault(key, value)
+            self._flush_handle = asyncio.get_running_loop().call_later(1.0, self.flush)
+            return
+        self.flushes += 1
+        self.rows_written += len(pending)
+
+    # ==================== BaseStorage ====================
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = self.key_builder.build(key)
+        _, data = self._load(k)
+        self._store(k, _state_name(state), data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return self._load(self.key_builder.build(key))[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        k = self.key_builder.build(key)
+        state, _ = self._load(k)
+        self._store(k, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return dict(self._load(self.key_builder.build(key))[1])
+
+    async def close(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "purged": self.purged
+        }
+
+def create_storage(backend: str, redis_url: str = "") -> BaseStorage:
+    """FSM storage for shared.dp: "memory", "sqlite" or "redis"
+
+    Redis needs the optional `redis` package; without it we fall back to SQLite.
+    """
+    if backend == "redis" and redis_url:
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+            ttl = int(FSM_STATE_TTL_SECONDS)
+            storage = RedisStorage.from_url(redis_url, state_ttl=ttl, data_ttl=ttl)
+            logger.info("✅ FSM storage: Redis")
+            return storage
+        except ImportError:
+            logger.warning("⚠️ FSM_STORAGE=redis but the redis package is not installed, using SQLite")
+    if backend == "memory":
+        from aiogram.fsm.storage.memory import MemoryStorage
+        return MemoryStorage()
+    return SQLiteStorage()
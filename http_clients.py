@@ -0,0 +1,123 @@
+# ===================================================
+# FILE: http_clients.py
+# SHARED OUTBOUND HTTP CLIENTS FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import aiohttp
+
+from shared import logger
+
+# Defaults for every registered client (each can override them)
+HTTP_POOL_LIMIT = int(os.environ.get("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.environ.get("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_TIMEOUT_SECONDS = float(os.environ.get("HTTP_TIMEOUT_SECONDS", 10))
+HTTP_KEEPALIVE_SECONDS = float(os.environ.get("HTTP_KEEPALIVE_SECONDS", 60))
+HTTP_DNS_CACHE_SECONDS = int(os.environ.get("HTTP_DNS_CACHE_SECONDS", 300))
+
+class _Client:
+    """One named connection pool and its usage counters"""
+
+    def __init__(self, name: str, limit: int, limit_per_host: int, timeout: float,
+                 headers: Optional[dict]):
+        self.name = name
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.session: Optional[aiohttp.ClientSession] = None
+
+        # Counters
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    def get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session binds to the running event loop
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+                ttl_dns_cache=HTTP_DNS_CACHE_SECONDS
+            )
+            self.session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self.session
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "utilization": round(self.in_flight / self.limit, 3) if self.limit else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "open": self.session is not None and not self.session.closed
+        }
+
+class HttpClients:
+    """Application-wide registry of pooled aiohttp sessions
+
+    Each outbound destination gets a named client with keep-alive, DNS
+    caching and its own limits; sessions are opened on first use and all
+    closed together at shutdown.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, _Client] = {}
+
+    def register(self, name: str, limit: int = HTTP_POOL_LIMIT,
+                 limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 timeout: float = HTTP_TIMEOUT_SECONDS, headers: Optional[dict] = None):
+        if name not in self._clients:
+            self._clients[name] = _Client(name, limit, limit_per_host, timeout, headers)
+
+    def _client(self, name: str) -> _Client:
+        client = self._clients.get(name)
+        if client is None:
+            # Unknown names get the defaults rather than failing the call
+            self.register(name)
+            client = self._clients[name]
+        return client
+
+    def session(self, name: str = "default") -> aiohttp.ClientSession:
+        return self._client(name).get_session()
+
+    @asynccontextmanager
+    async def request(self, name: str, method: str, url: str, **kwargs):
+        """session.request() through the named pool, counted for stats()"""
+        client = self._client(name)
+        session = client.get_session()
+        client.requests += 1
+        client.in_flight += 1
+        client.max_in_flight = max(client.max_in_flight, client.in_flight)
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                yield response
+        except Exception:
+            client.errors += 1
+            raise
+        finally:
+            client.in_flight -= 1
+
+    async def close(self):
+        for client in self._clients.values():
+            if client.session and not client.session.closed:
+                await client.session.close()
+        logger.info("✅ HTTP clients closed")
+
+    def stats(self) -> dict:
+        return {name: client.stats() for name, client in self._clients.items()}
+
+# Global registry; "default" serves one-off calls (pinger, health checks)
+http_clients = HttpClients()
+http_clients.register("default")
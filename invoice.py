@@ -3,6 +3,7 @@
 # PAYMENT HANDLING FOR Y.I.T BOT
 # ===================================================
 
+import asyncio
 import logging
 from datetime import datetime, timedelta
 
@@ -13,7 +14,11 @@ from aiogram.types import (
     LabeledPrice, InlineKeyboardMarkup, InlineKeyboardButton
 )
 
-from shared import bot, dp, supabase, logger, PROVIDER_TOKEN
+from shared import bot, dp, logger, PROVIDER_TOKEN
+from repository import repo
+from premium_cache import premium_cache
+from premium_events import premium_events
+from stats import stats_aggregator
 
 # ==================== PAYMENT HANDLERS (STARS) ====================
 
@@ -30,8 +35,7 @@ async def on_successful_payment(message: Message):
         # Calculate expiry (30 days from now)
         expires_at = datetime.utcnow() + timedelta(days=30)
         
-        # Record the payment
-        supabase.table("payments").insert({
+        payment_row = {
             "telegram_id": telegram_id,
             "provider": "telegram_stars",
             "amount": payment.total_amount,
@@ -39,15 +43,38 @@ async def on_successful_payment(message: Message):
             "payload": payment.invoice_payload,
             "transaction_id": payment.telegram_payment_charge_id,
             "status": "completed"
-        }).execute()
+        }
+        
+        # Record the payment (and look the user up for the stats counters)
+        _, existing_user = await asyncio.gather(
+            repo.insert_payment(payment_row),
+            repo.get_user_premium(telegram_id)
+        )
 
         # Update User Premium Status
-        supabase.table("users").upsert({
+        await repo.upsert_user({
             "telegram_id": telegram_id,
             "is_premium": True,
             "premium_expires_at": expires_at.isoformat(),
             "updated_at": datetime.utcnow().isoformat()
-        }).execute()
+        })
+        
+        stats_aggregator.record_payment(
+            payment.total_amount,
+            payment.currency,
+            new_user=existing_user is None,
+            newly_premium=not (existing_user and existing_user.get("is_premium") in (True, "true", 1))
+        )
+        
+        # Make the activation visible to /api/check-premium and /premium right away
+        premium_cache.put(telegram_id, expires_at)
+        
+        # Wake any mini app waiting on /api/premium/stream or /api/premium/wait
+        premium_events.publish(telegram_id, {
+            "is_premium": True,
+            "expires_at": expires_at.isoformat(),
+            "days_left": (expires_at - datetime.utcnow()).days
+        })
 
         # Send congratulatory message
         await message.answer(
@@ -0,0 +1,110 @@
+# ===================================================
+# FILE: leader.py
+# LEADER ELECTION BETWEEN WORKER PROCESSES
+# ===================================================
+
+import os
+import asyncio
+import tempfile
+from typing import Awaitable, Callable, Optional
+
+from shared import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, run as a single process
+    fcntl = None
+
+# Worker processes serving the app (uvicorn reads the same variable). Keep
+# the default of 1 unless you need it: update dedup is shared between
+# workers, but updates of one chat are only ordered within a worker
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1) or 1)
+LEADER_LOCK_PATH = os.environ.get("LEADER_LOCK_PATH", os.path.join(tempfile.gettempdir(), "yitio_leader.lock"))
+# How often followers try to take over from a leader that went away
+LEADER_RETRY_SECONDS = float(os.environ.get("LEADER_RETRY_SECONDS", 15))
+
+class LeaderElection:
+    """Exclusive flock on a local file; whoever holds it is the leader
+
+    The kernel drops the lock when the holding process exits or crashes,
+    so a follower's next retry takes over. Only works between processes
+    on one machine, which is what uvicorn's workers are.
+    """
+
+    def __init__(self, path: str = LEADER_LOCK_PATH):
+        self.path = path
+        self.is_leader = False
+        self._fd: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.attempts = 0
+        self.elected_at_startup = False
+
+    def try_acquire(self) -> bool:
+        if self.is_leader:
+            return True
+        self.attempts += 1
+        if fcntl is None:
+            self.is_leader = True
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        self.is_leader = True
+        logger.info(f"👑 Worker {os.getpid()} is the leader")
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self.is_leader = False
+
+    async def _campaign(self, on_elected: Callable[[], Awaitable]):
+        while not self.try_acquire():
+            await asyncio.sleep(LEADER_RETRY_SECONDS)
+        logger.info(f"👑 Worker {os.getpid()} took over as leader")
+        await on_elected()
+
+    def start(self, on_elected: Callable[[bool], Awaitable]) -> bool:
+        """Run on_elected(True) now if we win, else on_elected(False) once we take over later
+
+        Returns whether this process leads from startup.
+        """
+        if self.try_acquire():
+            self.elected_at_startup = True
+            self._task = asyncio.create_task(on_elected(True))
+            return True
+        logger.info(f"👥 Worker {os.getpid()} is a follower")
+        self._task = asyncio.create_task(self._campaign(lambda: on_elected(False)))
+        return False
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self.release()
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "workers": WEB_CONCURRENCY,
+            "is_leader": self.is_leader,
+            "elected_at_startup": self.elected_at_startup,
+            "attempts": self.attempts
+        }
+
+# Global election for this worker process
+leader = LeaderElection()
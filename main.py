@@ -7,12 +7,14 @@
 import os
 import sys
 import asyncio
+import json
+import hashlib
 import logging
-import random
 from datetime import datetime
 from typing import Optional
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from aiogram import Bot, Dispatcher, F
 from aiogram.types import Message, BotCommand, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
@@ -22,33 +24,71 @@ from aiogram.fsm.context import FSMContext
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import shared variables
-from shared import bot, dp, supabase, logger, ADMIN_ID
+from shared import bot, dp, logger, ADMIN_ID
+from repository import repo
 
 # Import modules - IMPORTANT: Import these after shared to avoid circular imports
 from ping import setup_pinger
 from webhook import router as webhook_router
 from admin import router as admin_router
-from utils import extract_video_id, get_embed_url, get_user_id_from_init_data  # <-- From utils now
+from utils import extract_video_id, get_embed_url, get_user_id_from_init_data, premium_expiry  # <-- From utils now
+from catalog import video_catalog, encode_cursor, decode_cursor, MAX_PAGE_SIZE, FEED_FORMATS
+from premium_cache import premium_cache
+from ranking import user_bucket
+from seen import seen_store
+from premium_events import premium_events, HubFullError
+from update_queue import update_queue, WEBHOOK_MODE
+from dedup import update_dedup
+from stats import stats_aggregator
+from telegram_auth import init_data_verifier, stream_tokens
+from http_clients import http_clients
+from replica import read_replica
+from metrics import MetricsMiddleware, render_metrics, setup_bot_metrics
+from leader import leader, WEB_CONCURRENCY
+from ratelimit import AdmissionMiddleware, admission
+from premium_sweeper import premium_sweeper
 
 # Import handlers directly to register them
 import invoice
 import admin as admin_module
 
+# Premium activation push (SSE / long-poll)
+PREMIUM_STREAM_HEARTBEAT_SECONDS = 15
+PREMIUM_STREAM_MAX_SECONDS = 600  # Client reconnects if it is still waiting
+PREMIUM_LONG_POLL_MAX_SECONDS = 30
+# Payments are published on the worker that handled them; with several workers
+# a waiting stream also re-reads the status this often (0 = never)
+PREMIUM_STREAM_RECHECK_SECONDS = float(os.environ.get(
+    "PREMIUM_STREAM_RECHECK_SECONDS", 5 if WEB_CONCURRENCY > 1 else 0))
+
+# Max video ids accepted per /api/videos/seen call
+MAX_SEEN_BATCH = 200
+
 # Initialize FastAPI
 app = FastAPI(title="Y.I.T Bot API")
 
+# Rate limits and the in-flight cap; inside CORS so rejections stay readable
+app.add_middleware(AdmissionMiddleware)
+
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After"],
 )
 
+# Latency/count metrics for every route, exported at /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(webhook_router)
 app.include_router(admin_router)
 
+# Latency/error metrics for every bot handler
+setup_bot_metrics(dp)
+
 # ==================== HEALTH & ROOT ENDPOINTS ====================
 
 @app.get("/health")
@@ -59,9 +99,29 @@ async def health_check():
         "status": "healthy",
         "service": "Y.I.T Bot",
         "timestamp": datetime.utcnow().isoformat(),
-        "ping_service": "active" if _pinger else "inactive"
+        "ping_service": "active" if _pinger else "inactive",
+        "video_catalog": video_catalog.stats(),
+        "premium_cache": premium_cache.stats(),
+        "premium_events": premium_events.stats(),
+        "update_queue": update_queue.stats(),
+        "update_dedup": update_dedup.stats(),
+        "seen_store": seen_store.stats(),
+        "init_data": init_data_verifier.stats(),
+        "stream_tokens": stream_tokens.stats(),
+        "http_clients": http_clients.stats(),
+        "read_replica": read_replica.stats(),
+        "leader": leader.stats(),
+        "admission": admission.stats(),
+        "db_singleflight": repo.reads.stats() if repo else None,
+        "premium_sweeper": premium_sweeper.stats(),
+        "fsm_storage": dp.storage.stats() if hasattr(dp.storage, "stats") else type(dp.storage).__name__
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-route, per-bot-handler and per-query latency"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     """Root endpoint with service info"""
@@ -72,134 +132,316 @@ async def root():
         "timestamp": datetime.utcnow().isoformat(),
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics",
             "set_webhook": "/webhook/set",
             "webhook_info": "/webhook/info",
             "api_videos": "/api/videos",
-            "api_check_premium": "/api/check-premium"
+            "api_check_premium": "/api/check-premium",
+            "api_premium_stream_token": "/api/premium/stream-token",
+            "api_premium_stream": "/api/premium/stream",
+            "api_premium_wait": "/api/premium/wait"
         },
         "ping_service": "active (every 8 minutes)" if _pinger else "inactive"
     }
 
 # ==================== FRONTEND API ====================
 
+def _request_user_id(request: Request, allow_token: bool = False) -> Optional[int]:
+    """Verified Telegram user of a mini-app request
+    
+    initData comes in the X-Telegram-Init-Data header only: query strings
+    end up in access logs. Where allow_token is set, a short-lived stream
+    token in `?token=` is accepted instead (see /api/premium/stream-token).
+    """
+    init_data = request.headers.get("X-Telegram-Init-Data", "")
+    if not init_data and allow_token:
+        return stream_tokens.verify(request.query_params.get("token"))
+    return get_user_id_from_init_data(init_data)
+
+def _require_user_id(request: Request, claimed: Optional[int] = None, allow_token: bool = False) -> int:
+    """Like _request_user_id, but 401 without valid initData and 403 for someone else's id"""
+    user_id = _request_user_id(request, allow_token)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if claimed is not None and claimed != user_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return user_id
+
+def _feed_etag(*parts) -> str:
+    """Strong ETag for one feed response, from everything that shapes it"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check per RFC 9110 13.1.2: a list, "*", weak comparison"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
 @app.get("/api/videos")
-async def get_videos(category: str = "All", limit: int = 50):
-    """Get videos by category"""
-    if not supabase:
-        return []
+async def get_videos(request: Request, category: str = "All", limit: int = 50,
+                     cursor: Optional[str] = None, since: Optional[str] = None, format: str = "full"):
+    """Get videos by category, in ranked feed order
+    
+    Without `cursor` this returns a plain list (first page). Passing `cursor`
+    (empty for the first page) returns {"videos": [...], "next_cursor": ...};
+    feed the `next_cursor` back to get the following page.
+    
+    `since=<created_at>` switches to delta mode: only videos added after that
+    high-water mark, newest first, as {"videos", "latest", "has_more"}.
+    
+    `format` picks the video representation: "full" (stored rows),
+    "compact" (id, platform, url, video_id, created_at only) or "columnar"
+    (those fields as parallel arrays, in place of the list of videos).
     
-    query = supabase.table('videos').select('*')
+    Responses carry an ETag; a matching If-None-Match gets 304 Not Modified.
+    """
+    if format not in FEED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FEED_FORMATS)}")
     
-    if category.lower() != "all":
-        query = query.eq('platform', category)
+    try:
+        after = decode_cursor(cursor or "")
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if not repo:
+        if since is not None:
+            return {"videos": [], "latest": since, "has_more": False}
+        return [] if cursor is None else {"videos": [], "next_cursor": None}
+    
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    # Each user gets a stable variant of the ranking (anonymous users share one)
+    user_id = _request_user_id(request)
+    
+    # Skip videos this user has already seen (server-side bitmap)
+    seen = await seen_store.get(user_id) if user_id else None
+    
+    # Nothing changed since the client's copy: answer before building the page
+    await video_catalog.get_videos(category)
+    etag = _feed_etag(video_catalog.version, category, limit, cursor, since, format, user_id,
+                      seen.version if seen is not None else "-")
+    if _etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    # Rows are plain JSON already, so skip FastAPI's jsonable_encoder pass
+    if since is not None:
+        # "+" in an unencoded timestamp arrives as a space
+        since = since.replace(" ", "+")
+        data, has_more = await video_catalog.get_since(category, since, limit)
+        return JSONResponse({
+            "videos": video_catalog.project(data, format),
+            "latest": data[0].get("created_at") if data else since,
+            "has_more": has_more
+        }, headers=headers)
     
-    query = query.order('created_at', desc=True)
-    res = query.execute()
-    data = res.data
+    # Served from the precomputed ranking of the shared in-memory catalog
+    data, next_key = await video_catalog.get_page(category, after, limit, bucket=user_bucket(user_id), exclude=seen)
+    
+    # Everything seen: start over rather than show an empty feed
+    if not data and after is None and seen is not None:
+        data, next_key = await video_catalog.get_page(category, None, limit, bucket=user_bucket(user_id))
+    
+    if cursor is None:
+        return JSONResponse(video_catalog.project(data, format), headers=headers)
+    
+    return JSONResponse({
+        "videos": video_catalog.project(data, format),
+        "next_cursor": encode_cursor(next_key) if next_key else None
+    }, headers=headers)
+
+@app.post("/api/videos/seen")
+async def mark_videos_seen(request: Request):
+    """Record videos the current Telegram user has watched
+    
+    Body: {"video_ids": [1, 2, ...]} (catalog ids from /api/videos).
+    Ids that are negative or beyond the newest video get a 400.
+    """
+    user_id = _require_user_id(request)
+    
+    try:
+        body = await request.json()
+        video_ids = [int(v) for v in body.get("video_ids", [])][:MAX_SEEN_BATCH]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid body")
     
-    # Shuffle but maintain some order (like IMAGIFHUB)
-    if data:
-        # Split into groups and shuffle within groups
-        groups = [data[i:i+10] for i in range(0, len(data), 10)]
-        shuffled = []
-        for group in groups:
-            group_copy = group.copy()
-            random.shuffle(group_copy)
-            shuffled.extend(group_copy)
-        data = shuffled
+    if video_ids:
+        if repo:
+            await video_catalog.get_videos()
+        if min(video_ids) < 0 or max(video_ids) > video_catalog.max_id:
+            raise HTTPException(status_code=400, detail="Unknown video id")
     
-    return data[:limit]
+    await seen_store.mark(user_id, video_ids)
+    return {"ok": True}
 
 @app.get("/api/check-premium")
-async def check_premium(user_id: int):
-    """Check premium status"""
+async def check_premium(request: Request, user_id: Optional[int] = None):
+    """Check premium status of the Telegram user signing the request
+    
+    `user_id` is optional; if given it must match the verified user.
+    """
+    return await premium_status(_require_user_id(request, user_id))
+
+async def premium_status(user_id: int, fresh: bool = False):
+    """Premium status of a user, served from the premium cache when possible
+    
+    `fresh` skips the cache (it is per worker, so it can miss a payment
+    handled by another one).
+    """
     try:
-        if not supabase:
+        if not repo:
             return {"is_premium": False, "expires_at": None, "days_left": None}
         
-        result = supabase.table("users") \
-            .select("*") \
-            .eq("telegram_id", user_id) \
-            .execute()
-        
-        if not result.data:
+        cached, expires_at = premium_cache.get(user_id) if not fresh else (False, None)
+        if cached:
+            if expires_at:
+                return {
+                    "is_premium": True,
+                    "expires_at": expires_at.isoformat(),
+                    "days_left": (expires_at - datetime.utcnow()).days
+                }
             return {"is_premium": False, "expires_at": None, "days_left": None}
         
-        data = result.data[0]
-        is_premium = data.get("is_premium")
-        expires_at_str = data.get("premium_expires_at")
-        
-        # Handle boolean value properly
-        is_premium_bool = False
-        if isinstance(is_premium, bool):
-            is_premium_bool = is_premium
-        elif isinstance(is_premium, str):
-            is_premium_bool = is_premium.lower() == 'true'
-        elif isinstance(is_premium, int):
-            is_premium_bool = bool(is_premium)
-        
-        # Check if premium is active
-        if is_premium_bool and expires_at_str:
-            try:
-                expires_at_str_clean = expires_at_str
-                if expires_at_str.endswith('Z'):
-                    expires_at_str_clean = expires_at_str.replace('Z', '+00:00')
-                
-                expires_at = datetime.fromisoformat(expires_at_str_clean)
-                now = datetime.utcnow().replace(tzinfo=None)
-                
-                if expires_at.tzinfo is not None:
-                    expires_at = expires_at.replace(tzinfo=None)
-                
-                if expires_at > now:
-                    days_left = (expires_at - now).days
-                    return {
-                        "is_premium": True,
-                        "expires_at": expires_at.isoformat(),
-                        "days_left": days_left
-                    }
-            except Exception as e:
-                logger.error(f"Date parsing error: {e}")
-        
+        expires_at = premium_expiry(await read_replica.get_user_premium(user_id))
+        premium_cache.put(user_id, expires_at)
+        if expires_at:
+            return {
+                "is_premium": True,
+                "expires_at": expires_at.isoformat(),
+                "days_left": (expires_at - datetime.utcnow()).days
+            }
         return {"is_premium": False, "expires_at": None, "days_left": None}
         
     except Exception as e:
-        logger.error(f"Error in check_premium: {e}")
+        logger.error(f"Error in premium_status: {e}")
         return {"is_premium": False, "expires_at": None, "days_left": None}
 
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/premium/stream-token")
+async def premium_stream_token(request: Request):
+    """Trade initData (in the header) for a short-lived token to open /api/premium/stream with"""
+    user_id = _require_user_id(request)
+    return {"token": stream_tokens.issue(user_id), "expires_in": stream_tokens.ttl}
+
+@app.get("/api/premium/stream")
+async def premium_stream(request: Request, user_id: Optional[int] = None):
+    """Server-Sent Events stream that fires once premium is active
+    
+    Sends a "premium" event (same body as /api/check-premium) and closes, or
+    a "timeout" event after PREMIUM_STREAM_MAX_SECONDS. Idle streams get a
+    keep-alive comment every PREMIUM_STREAM_HEARTBEAT_SECONDS, and with
+    several workers re-read the status every PREMIUM_STREAM_RECHECK_SECONDS.
+    EventSource can't send headers, so authenticate with ?token=... from
+    /api/premium/stream-token; initData itself never goes in the URL.
+    """
+    user_id = _require_user_id(request, user_id, allow_token=True)
+    
+    if premium_events.is_full():
+        raise HTTPException(status_code=503, detail="Too many subscribers", headers={"Retry-After": "30"})
+    
+    async def events():
+        try:
+            future = premium_events.subscribe(user_id)
+        except HubFullError:
+            yield "retry: 30000\n\n"
+            return
+        
+        try:
+            # Subscribe before checking so an activation in between is not lost
+            status = await premium_status(user_id)
+            if status["is_premium"]:
+                yield _sse("premium", status)
+                return
+            
+            yield "retry: 5000\n\n"
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + PREMIUM_STREAM_MAX_SECONDS
+            tick = min(PREMIUM_STREAM_HEARTBEAT_SECONDS, PREMIUM_STREAM_RECHECK_SECONDS or PREMIUM_STREAM_HEARTBEAT_SECONDS)
+            next_heartbeat = loop.time() + PREMIUM_STREAM_HEARTBEAT_SECONDS
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    yield _sse("timeout", status)
+                    return
+                done, _ = await asyncio.wait({future}, timeout=min(tick, remaining))
+                if done:
+                    yield _sse("premium", future.result())
+                    return
+                if PREMIUM_STREAM_RECHECK_SECONDS:
+                    status = await premium_status(user_id, fresh=True)
+                    if status["is_premium"]:
+                        yield _sse("premium", status)
+                        return
+                if loop.time() + 0.1 >= next_heartbeat:
+                    next_heartbeat = loop.time() + PREMIUM_STREAM_HEARTBEAT_SECONDS
+                    yield ": keepalive\n\n"
+        finally:
+            premium_events.unsubscribe(user_id, future)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/premium/wait")
+async def premium_wait(request: Request, user_id: Optional[int] = None, timeout: float = 25):
+    """Long-poll fallback: returns as soon as premium is active, or after `timeout` seconds"""
+    user_id = _require_user_id(request, user_id)
+    timeout = max(0.0, min(timeout, PREMIUM_LONG_POLL_MAX_SECONDS))
+    
+    try:
+        future = premium_events.subscribe(user_id)
+    except HubFullError:
+        raise HTTPException(status_code=503, detail="Too many subscribers", headers={"Retry-After": "30"})
+    
+    try:
+        status = await premium_status(user_id)
+        if status["is_premium"]:
+            return status
+        
+        done, _ = await asyncio.wait({future}, timeout=timeout)
+        if done:
+            return future.result()
+        # The payment may have landed on another worker
+        return await premium_status(user_id, fresh=True) if PREMIUM_STREAM_RECHECK_SECONDS else status
+    finally:
+        premium_events.unsubscribe(user_id, future)
+
 @app.get("/api/user-data")
 async def get_user_data(request: Request):
     """Get user data for the current Telegram user"""
     try:
-        import urllib.parse
-        import json
-        
-        # Get user from Telegram WebApp initData
-        init_data = request.headers.get("X-Telegram-Init-Data", "")
+        # Get user from Telegram WebApp initData (signature verified, parsed once)
+        init_data = init_data_verifier.verify(request.headers.get("X-Telegram-Init-Data", ""))
         
-        if not init_data:
+        if not init_data or not init_data.user_id:
             return {"user": None, "premium": False}
         
-        user_id = get_user_id_from_init_data(init_data)
-        
-        if not user_id:
-            return {"user": None, "premium": False}
-        
-        # Get user info from initData
-        try:
-            parsed = urllib.parse.parse_qs(init_data)
-            user_json = json.loads(parsed['user'][0])
-            user_info = {
-                "id": user_json.get('id'),
-                "username": user_json.get('username'),
-                "first_name": user_json.get('first_name'),
-                "last_name": user_json.get('last_name')
-            }
-        except:
-            user_info = {"id": user_id}
+        user_id = init_data.user_id
+        user_info = {
+            "id": user_id,
+            "username": init_data.user.get('username'),
+            "first_name": init_data.user.get('first_name'),
+            "last_name": init_data.user.get('last_name')
+        }
         
         # Check premium status
-        premium_result = await check_premium(user_id)
+        premium_result = await premium_status(user_id)
         
         return {
             "user": user_info,
@@ -234,73 +476,29 @@ async def cmd_premium(message: Message):
     telegram_id = message.from_user.id
     
     try:
-        if not supabase:
+        if not repo:
             await message.answer("❌ Database not connected. Please try again later.")
             return
             
-        user_result = supabase.table("users") \
-            .select("is_premium, premium_expires_at") \
-            .eq("telegram_id", telegram_id) \
-            .execute()
+        cached, expires_at = premium_cache.get(telegram_id)
+        
+        if not cached:
+            expires_at = premium_expiry(await read_replica.get_user_premium(telegram_id))
+            premium_cache.put(telegram_id, expires_at)
         
-        if not user_result.data or len(user_result.data) == 0:
-            # User not in database - offer premium
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="⭐ Get Premium", callback_data="get_premium")],
-                [InlineKeyboardButton(text="🎬 Open Y.I.T", web_app={"url": "https://ojareridominion-prog.github.io/y.i.t.i.o/"})]
-            ])
+        now = datetime.utcnow()
+        if expires_at and expires_at > now:
+            days_left = (expires_at - now).days
             await message.answer(
-                "✨ *Y.I.T Premium*\n\n"
-                "🔓 You are currently on the free plan.\n\n"
-                "✨ *Upgrade to Premium for:*\n"
-                "• 🚫 No ads\n"
-                "• 😁 Support the project\n\n"
-                "💫 *Price:* 149 Stars (30 days)\n\n"
-                "Click 'Get Premium' to upgrade!",
-                parse_mode="HTML",
-                reply_markup=keyboard
+                f"✨ *Premium Status*\n\n"
+                f"✅ You are a *Premium Member*!\n"
+                f"⏳ Days remaining: *{days_left}* day(s)\n"
+                f"📅 Expires on: {expires_at.strftime('%Y-%m-%d')}\n\n"
+                f"Enjoy your ad-free experience! 🎉",
+                parse_mode="HTML"
             )
             return
         
-        user_data = user_result.data[0]
-        is_premium = user_data.get("is_premium", False)
-        premium_expires_at = user_data.get("premium_expires_at")
-        
-        # Handle boolean value properly
-        is_premium_bool = False
-        if isinstance(is_premium, bool):
-            is_premium_bool = is_premium
-        elif isinstance(is_premium, str):
-            is_premium_bool = is_premium.lower() == 'true'
-        elif isinstance(is_premium, int):
-            is_premium_bool = bool(is_premium)
-        
-        if is_premium_bool and premium_expires_at:
-            try:
-                expires_at_str = premium_expires_at
-                if expires_at_str.endswith('Z'):
-                    expires_at_str = expires_at_str.replace('Z', '+00:00')
-                
-                expires_at = datetime.fromisoformat(expires_at_str)
-                now = datetime.utcnow().replace(tzinfo=None)
-                
-                if expires_at.tzinfo is not None:
-                    expires_at = expires_at.replace(tzinfo=None)
-                
-                if expires_at > now:
-                    days_left = (expires_at - now).days
-                    await message.answer(
-                        f"✨ *Premium Status*\n\n"
-                        f"✅ You are a *Premium Member*!\n"
-                        f"⏳ Days remaining: *{days_left}* day(s)\n"
-                        f"📅 Expires on: {expires_at.strftime('%Y-%m-%d')}\n\n"
-                        f"Enjoy your ad-free experience! 🎉",
-                        parse_mode="HTML"
-                    )
-                    return
-            except Exception as e:
-                logger.error(f"Date parsing error: {e}")
-        
         # If we get here, user is not premium
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="⭐ Get Premium", callback_data="get_premium")],
@@ -329,17 +527,33 @@ async def start_premium(message: Message):
 
 # ==================== STARTUP & SHUTDOWN ====================
 
-# In the startup_event function, replace the webhook setting section:
+# Startup only does in-process work before serving; everything that talks to
+# Telegram, Supabase or our own public URL runs in the background warm-up and
+# is reported by /ready.
+_startup = {
+    "started_at": None,
+    "phases_ms": {},
+    "ready": {"webhook": False, "catalog": False},
+    "errors": {}
+}
+_warmup_task: Optional[asyncio.Task] = None
+STARTUP_WEBHOOK_ATTEMPTS = 3
 
-@app.on_event("startup")
-async def startup_event():
-    """Run startup tasks"""
-    logger.info("🚀 Starting Y.I.T Bot...")
-    
-    # Import here to avoid circular imports
-    from shared import _pinger, bot, dp, WEBHOOK_URL, WEBHOOK_SECRET_TOKEN
-    
-    # Set bot commands
+async def _phase(name: str, coro):
+    """Run one startup phase, logging and recording how long it took"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        return await coro
+    except Exception as e:
+        _startup["errors"][name] = str(e)[:200]
+        raise
+    finally:
+        elapsed = (loop.time() - started) * 1000
+        _startup["phases_ms"][name] = round(elapsed, 1)
+        logger.info(f"⏱️ Startup phase {name}: {elapsed:.0f} ms")
+
+async def _set_commands():
     commands = [
         BotCommand(command="start", description="Start the bot"),
         BotCommand(command="premium", description="Premium status & purchase")
@@ -348,50 +562,133 @@ async def startup_event():
     if ADMIN_ID:
         commands.append(BotCommand(command="admin", description="Admin panel"))
     
-    try:
-        await bot.set_my_commands(commands)
-        logger.info("✅ Bot commands set successfully")
-    except Exception as e:
-        logger.error(f"❌ Error setting commands: {e}")
-    
-    # Start pinger FIRST (so it can warm up the server)
-    _pinger = await setup_pinger()
+    await bot.set_my_commands(commands)
+    logger.info("✅ Bot commands set successfully")
+
+def _webhook_url() -> str:
+    from shared import WEBHOOK_URL
+    # Use the pattern that's already working
+    return WEBHOOK_URL or "https://y-i-t-i-o.onrender.com/api/telegram-webhook"
+
+async def _set_webhook():
+    from shared import WEBHOOK_SECRET_TOKEN
+    webhook_url = _webhook_url()
+    for attempt in range(1, STARTUP_WEBHOOK_ATTEMPTS + 1):
+        try:
+            await bot.set_webhook(
+                url=webhook_url,
+                drop_pending_updates=True,
+                allowed_updates=["message", "callback_query", "pre_checkout_query"],
+                secret_token=WEBHOOK_SECRET_TOKEN if WEBHOOK_SECRET_TOKEN != "YOUR_WEBHOOK_SECRET" else None
+            )
+            logger.info(f"✅ Webhook set to: {webhook_url}")
+            _startup["ready"]["webhook"] = True
+            return
+        except Exception as e:
+            logger.error(f"❌ Error setting webhook (attempt {attempt}/{STARTUP_WEBHOOK_ATTEMPTS}): {e}")
+            if attempt < STARTUP_WEBHOOK_ATTEMPTS:
+                await asyncio.sleep(2 ** attempt)
+                continue
+            # Fallback to polling if webhook fails (for development)
+            if os.environ.get("USE_POLLING", "").lower() == "true":
+                logger.info("⚠️ Falling back to polling mode...")
+                asyncio.create_task(dp.start_polling(bot))
+                _startup["ready"]["webhook"] = True
+            raise
+
+async def _load_catalog():
+    if repo:
+        await video_catalog.get_videos()
+    _startup["ready"]["catalog"] = True
+
+async def _start_pinger():
+    import shared
+    shared._pinger = await setup_pinger()
+
+async def _check_public_health():
+    """Reach our own /health through the public URL, as Telegram would"""
+    health_url = _webhook_url().split("/api/")[0].rstrip("/") + "/health"
+    async with http_clients.request("default", "GET", health_url) as response:
+        logger.info(f"✅ Health check response: {response.status}")
+
+async def _warm_up(is_leader: bool):
+    """Network-bound startup steps, concurrently and off the serving path
     
-    # Wait a moment for pinger to initialize
-    await asyncio.sleep(2)
+    Telegram-side setup and the pinger run on the leader worker only: a
+    second set_webhook(drop_pending_updates=True) would discard updates.
+    """
+    phases = {"load_catalog": _load_catalog()}
+    if is_leader:
+        phases.update(set_commands=_set_commands(), set_webhook=_set_webhook(), pinger=_start_pinger())
+    else:
+        # The leader registers the webhook; followers just serve it
+        _startup["ready"]["webhook"] = True
     
-    # Auto-set webhook - USE THE CORRECT PATTERN
-    webhook_url = WEBHOOK_URL
-    if not webhook_url:
-        # Use the pattern that's already working
-        webhook_url = "https://y-i-t-i-o.onrender.com/api/telegram-webhook"
+    results = await asyncio.gather(*(_phase(name, coro) for name, coro in phases.items()),
+                                   return_exceptions=True)
+    for name, result in zip(phases, results):
+        if isinstance(result, Exception) and name != "set_webhook":
+            logger.error(f"❌ Startup phase {name} failed: {result}")
     
-    try:
-        await bot.set_webhook(
-            url=webhook_url,
-            drop_pending_updates=True,
-            allowed_updates=["message", "callback_query", "pre_checkout_query"],
-            secret_token=WEBHOOK_SECRET_TOKEN if WEBHOOK_SECRET_TOKEN != "YOUR_WEBHOOK_SECRET" else None
-        )
-        logger.info(f"✅ Webhook set to: {webhook_url}")
-        
-        # Test the webhook immediately
+    if is_leader and _startup["ready"]["webhook"]:
         try:
-            import httpx
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get("https://y-i-t-i-o.onrender.com/health")
-                logger.info(f"✅ Health check response: {response.status_code}")
+            await _phase("public_health", _check_public_health())
         except Exception as e:
             logger.warning(f"⚠️ Could not test health endpoint: {e}")
-            
-    except Exception as e:
-        logger.error(f"❌ Error setting webhook: {e}")
-        # Fallback to polling if webhook fails (for development)
-        if os.environ.get("USE_POLLING", "").lower() == "true":
-            logger.info("⚠️ Falling back to polling mode...")
-            asyncio.create_task(dp.start_polling(bot))
     
-    logger.info("✅ Bot startup complete!")
+    total = (asyncio.get_running_loop().time() - _startup["started_at"]) * 1000
+    logger.info(f"✅ Bot warm-up complete in {total:.0f} ms (ready: {_startup['ready']})")
+
+async def _lead(at_startup: bool):
+    """Singleton background jobs, run by whichever worker holds the leader lock"""
+    read_replica.start_sync()
+    # Expire lapsed premium users and send renewal reminders
+    premium_sweeper.start()
+    if not at_startup:
+        # Took over from a leader that exited: the webhook is already set,
+        # only its periodic jobs move here
+        await _start_pinger()
+
+@app.on_event("startup")
+async def startup_event():
+    """Start in-process services, then warm up dependencies in the background"""
+    global _warmup_task
+    logger.info("🚀 Starting Y.I.T Bot...")
+    _startup["started_at"] = asyncio.get_running_loop().time()
+    
+    # Start background update workers before Telegram can reach the webhook
+    if WEBHOOK_MODE == "queue":
+        update_queue.start()
+    
+    # Periodic reconcile of the admin stats counters
+    stats_aggregator.start()
+    
+    # Write-behind of users' seen-video bitmaps
+    seen_store.start()
+    
+    # Local SQLite replica for read paths; every worker reads it, the leader syncs it
+    read_replica.start()
+    
+    is_leader = leader.start(_lead)
+    _warmup_task = asyncio.create_task(_warm_up(is_leader))
+    logger.info("✅ Bot startup complete, serving while dependencies warm up")
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once the webhook is set and the catalog is loaded, else 503
+    
+    /health only says the process is up.
+    """
+    is_ready = all(_startup["ready"].values())
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "ready": is_ready,
+            "dependencies": _startup["ready"],
+            "startup_phases_ms": _startup["phases_ms"],
+            "errors": _startup["errors"]
+        }
+    )
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -399,9 +696,26 @@ async def shutdown_event():
     from shared import _pinger, bot
     logger.info("🛑 Shutting down...")
     
+    if _warmup_task and not _warmup_task.done():
+        _warmup_task.cancel()
+    
     if _pinger:
         await _pinger.stop()
     
+    # Finish queued updates while the bot session and database are still open
+    await update_queue.stop()
+    await stats_aggregator.stop()
+    await premium_sweeper.stop()
+    await seen_store.stop()
+    await read_replica.stop()
+    # Let a follower take over the singleton jobs
+    await leader.stop()
+    # Flush buffered FSM writes
+    await dp.storage.close()
+    
+    # Outbound pools (Supabase, pinger, health checks)
+    await http_clients.close()
+    
     await bot.session.close()
     logger.info("✅ Cleanup complete")
 
@@ -412,11 +726,13 @@ if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))
     host = os.environ.get("HOST", "0.0.0.0")
     
-    logger.info(f"🌐 Starting server on {host}:{port}")
+    logger.info(f"🌐 Starting server on {host}:{port} with {WEB_CONCURRENCY} worker(s)")
     uvicorn.run(
-        app, 
+        # Several workers need an import string so each process loads the app
+        "main:app" if WEB_CONCURRENCY > 1 else app,
         host=host, 
         port=port,
+        workers=WEB_CONCURRENCY,
         # These settings help with Render's timeout issues
         timeout_keep_alive=65,
         access_log=True
@@ -0,0 +1,178 @@
+# ===================================================
+# FILE: metrics.py
+# PROMETHEUS METRICS FOR Y.I.T.I.O BOT
+# ===================================================
+
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Everything runs on the event loop thread, so the metrics below are plain
+# dicts and lists with no locks; a label set's series is created on first use.
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _pairs(names: Tuple[str, ...], values: tuple) -> List[str]:
+    return [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+
+def _labels(names: Tuple[str, ...], values: tuple) -> str:
+    pairs = _pairs(names, values)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (+Inf last)..., sum]; cumulated on export
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        for labels, series in self._series.items():
+            pairs = _pairs(self.labelnames, labels)
+            total = 0
+            for bound, count in zip(bounds, series):
+                total += count
+                bucket_labels = ",".join(pairs + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {total}")
+            plain = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{plain} {series[-1]}")
+            lines.append(f"{self.name}_count{plain} {total}")
+        return lines
+
+# ==================== APP METRICS ====================
+
+http_requests = Counter("yitio_http_requests_total", "HTTP requests by route and status",
+                        ("method", "route", "status"))
+http_latency = Histogram("yitio_http_request_duration_seconds", "HTTP request latency by route",
+                         ("method", "route"))
+bot_handler_latency = Histogram("yitio_bot_handler_duration_seconds", "aiogram handler latency",
+                                ("event", "handler"))
+bot_handler_errors = Counter("yitio_bot_handler_errors_total", "aiogram handlers that raised",
+                             ("event", "handler"))
+http_rejected = Counter("yitio_http_rejected_total", "Requests refused by admission control",
+                        ("route", "reason"))
+db_latency = Histogram("yitio_db_query_duration_seconds", "Supabase call latency by table and operation",
+                       ("table", "op"))
+db_errors = Counter("yitio_db_query_errors_total", "Failed Supabase calls by table and operation",
+                    ("table", "op"))
+singleflight_calls = Counter("yitio_singleflight_calls_total",
+                             "Coalesced reads: calls made (leader) vs joined in flight (collapsed)",
+                             ("group", "outcome"))
+
+METRICS = [http_requests, http_latency, http_rejected, bot_handler_latency, bot_handler_errors,
+           db_latency, db_errors, singleflight_calls]
+
+def render_metrics() -> str:
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# ==================== MIDDLEWARES ====================
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request, labelled by route template
+
+    The router stores the matched endpoint in the scope; it is mapped back to
+    its path template so /api/videos?x=1 and /api/videos?x=2 share a series.
+    Unmatched paths all count as "unmatched" to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Any, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            app = scope.get("app")
+            for r in getattr(app, "routes", ()):
+                if getattr(r, "endpoint", None) is endpoint:
+                    route = r.path
+                    break
+            route = self._routes[endpoint] = route or getattr(endpoint, "__name__", "unknown")
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route(scope)
+            http_latency.observe(time.perf_counter() - started, scope["method"], route)
+            http_requests.inc(scope["method"], route, status[0])
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """aiogram inner middleware timing each handler call by its function name"""
+
+    def __init__(self, event: str):
+        self.event = event
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                      event: TelegramObject, data: Dict[str, Any]) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            bot_handler_errors.inc(self.event, name)
+            raise
+        finally:
+            bot_handler_latency.observe(time.perf_counter() - started, self.event, name)
+
+def setup_bot_metrics(dp):
+    """Time every handler registered on the dispatcher, for each update type"""
+    for event, observer in dp.observers.items():
+        if event not in ("update", "error"):
+            observer.middleware(HandlerMetricsMiddleware(event))
@@ -7,6 +7,8 @@ import asyncio
 import logging
 import aiohttp
 import os
+
+from http_clients import http_clients
 from datetime import datetime
 from typing import Optional
 
@@ -24,10 +26,9 @@ class RenderPinger:
     async def ping(self):
         """Perform a single ping request"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.ping_url, timeout=10) as response:
-                    logger.info(f"🌐 Ping to {self.ping_url} - Status: {response.status}")
-                    return response.status
+            async with http_clients.request("default", "GET", self.ping_url) as response:
+                logger.info(f"🌐 Ping to {self.ping_url} - Status: {response.status}")
+                return response.status
         except aiohttp.ClientError as e:
             logger.warning(f"⚠️ Ping failed: {e}")
             return None
@@ -44,18 +45,15 @@ class RenderPinger:
         self.is_running = True
         logger.info(f"🚀 Starting pinger for {self.ping_url} every {self.interval/60} minutes")
         
-        # Perform initial ping immediately
-        await self.ping()
-        
-        # Start the periodic pinging task
+        # Start the periodic pinging task; the first ping runs right away,
+        # without holding up the caller
         self.task = asyncio.create_task(self._ping_loop())
     
     async def _ping_loop(self):
         """Main pinging loop"""
         while self.is_running:
+            await self.ping()
             await asyncio.sleep(self.interval)
-            if self.is_running:
-                await self.ping()
     
     async def stop(self):
         """Stop the pinger service"""
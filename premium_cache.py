@@ -0,0 +1,78 @@
+# ===================================================
+# FILE: premium_cache.py
+# PREMIUM STATUS CACHE FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+# Max number of users kept in memory (least recently used are evicted)
+PREMIUM_CACHE_SIZE = int(os.environ.get("PREMIUM_CACHE_SIZE", 10000))
+# How long a "not premium" answer is trusted before asking the database again
+PREMIUM_NEGATIVE_TTL_SECONDS = float(os.environ.get("PREMIUM_NEGATIVE_TTL_SECONDS", 60))
+
+class PremiumCache:
+    """Bounded LRU cache of premium expiry per telegram_id
+
+    A premium entry stays valid until its premium_expires_at; a free-user
+    entry only for a short negative TTL, so new payments made elsewhere
+    are still picked up.
+    """
+
+    def __init__(self, max_size: int = PREMIUM_CACHE_SIZE,
+                 negative_ttl: float = PREMIUM_NEGATIVE_TTL_SECONDS):
+        self.max_size = max_size
+        self.negative_ttl = timedelta(seconds=negative_ttl)
+        # telegram_id -> (active expiry or None, entry valid until)
+        self._entries: "OrderedDict[int, Tuple[Optional[datetime], datetime]]" = OrderedDict()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, telegram_id: int) -> Tuple[bool, Optional[datetime]]:
+        """Return (hit, expires_at); expires_at is None for free users"""
+        entry = self._entries.get(telegram_id)
+        if entry is not None:
+            expires_at, valid_until = entry
+            if datetime.utcnow() < valid_until:
+                self._entries.move_to_end(telegram_id)
+                self.hits += 1
+                return True, expires_at
+            del self._entries[telegram_id]
+        self.misses += 1
+        return False, None
+
+    def put(self, telegram_id: int, expires_at: Optional[datetime]):
+        """Store the active premium expiry (None for a free user)"""
+        if expires_at is not None and expires_at > datetime.utcnow():
+            valid_until = expires_at
+        else:
+            expires_at = None
+            valid_until = datetime.utcnow() + self.negative_ttl
+
+        self._entries[telegram_id] = (expires_at, valid_until)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, telegram_id: int):
+        self._entries.pop(telegram_id, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0,
+            "evictions": self.evictions
+        }
+
+# Global cache shared by the API and the bot handlers
+premium_cache = PremiumCache()
@@ -0,0 +1,75 @@
+# ===================================================
+# FILE: premium_events.py
+# PREMIUM ACTIVATION PUB/SUB FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import asyncio
+from typing import Dict, Set
+
+# Hard cap on concurrently waiting clients (SSE + long-poll)
+PREMIUM_MAX_SUBSCRIBERS = int(os.environ.get("PREMIUM_MAX_SUBSCRIBERS", 20000))
+
+class HubFullError(Exception):
+    """Raised when no more subscribers can be accepted"""
+
+class PremiumEventHub:
+    """In-process pub/sub for premium activations, keyed by telegram_id
+
+    A waiting client costs one Future in a dict: no task, no queue and no
+    timer of its own, so thousands of idle subscribers are cheap.
+    """
+
+    def __init__(self, max_subscribers: int = PREMIUM_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[int, Set[asyncio.Future]] = {}
+        self._count = 0
+
+        # Counters
+        self.published = 0
+        self.delivered = 0
+        self.rejected = 0
+
+    def is_full(self) -> bool:
+        return self._count >= self.max_subscribers
+
+    def subscribe(self, telegram_id: int) -> asyncio.Future:
+        """Register interest in the next event for a user"""
+        if self.is_full():
+            self.rejected += 1
+            raise HubFullError("Too many subscribers")
+        future = asyncio.get_running_loop().create_future()
+        self._subscribers.setdefault(telegram_id, set()).add(future)
+        self._count += 1
+        return future
+
+    def unsubscribe(self, telegram_id: int, future: asyncio.Future):
+        waiters = self._subscribers.get(telegram_id)
+        if waiters and future in waiters:
+            waiters.discard(future)
+            self._count -= 1
+            if not waiters:
+                del self._subscribers[telegram_id]
+
+    def publish(self, telegram_id: int, event: dict) -> int:
+        """Wake every subscriber of a user; returns how many were waiting"""
+        self.published += 1
+        waiters = self._subscribers.pop(telegram_id, set())
+        self._count -= len(waiters)
+        for future in waiters:
+            if not future.done():
+                future.set_result(event)
+                self.delivered += 1
+        return len(waiters)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._count,
+            "users": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "rejected": self.rejected
+        }
+
+# Global hub shared by the API and the payment handler
+premium_events = PremiumEventHub()
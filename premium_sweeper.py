@@ -0,0 +1,214 @@
+# ===================================================
+# FILE: premium_sweeper.py
+# PREMIUM EXPIRY & RENEWAL REMINDERS FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import json
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from shared import bot, logger
+from repository import repo, RepositoryError
+from premium_cache import premium_cache
+from stats import stats_aggregator
+from utils import parse_timestamp
+
+PREMIUM_SWEEP_SECONDS = float(os.environ.get("PREMIUM_SWEEP_SECONDS", 900))
+# Remind users this many days before their premium ends (comma separated)
+PREMIUM_REMINDER_DAYS = sorted(
+    {int(d) for d in os.environ.get("PREMIUM_REMINDER_DAYS", "3,1").split(",") if d.strip()}, reverse=True
+)
+# Reminders are sent this many at a time, one batch per interval (Bot API allows ~30 msg/s)
+REMINDER_BATCH_SIZE = int(os.environ.get("REMINDER_BATCH_SIZE", 25))
+REMINDER_BATCH_INTERVAL_SECONDS = float(os.environ.get("REMINDER_BATCH_INTERVAL_SECONDS", 1.0))
+
+# Supabase table (name text primary key, state text, updated_at) for job progress
+JOB_STATE_TABLE = "job_state"
+JOB_NAME = "premium_sweeper"
+
+USER_COLUMNS = "telegram_id,is_premium,premium_expires_at,updated_at"
+
+class PremiumSweeper:
+    """Periodically expires lapsed premium users and sends renewal reminders
+
+    Expiry is one PATCH of every user still flagged premium whose
+    premium_expires_at has passed (keep an index on that column). Reminders
+    walk users by premium_expires_at: for each N in PREMIUM_REMINDER_DAYS a
+    cursor marks how far "expires within N days" has been covered, so each
+    expiry date is reminded once per N and a restart resumes from the
+    persisted cursors instead of rescanning. Runs on the leader worker only.
+    """
+
+    def __init__(self):
+        # days (as str, for JSON) -> premium_expires_at reminded up to
+        self._cursors: Dict[str, str] = {}
+        self._state_loaded = False
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.last_sweep_at: Optional[datetime] = None
+
+        # Counters
+        self.sweeps = 0
+        self.expired = 0
+        self.reminders_sent = 0
+        self.reminders_failed = 0
+        self.errors = 0
+
+    # ==================== PROGRESS ====================
+
+    async def _load_state(self):
+        try:
+            rows = await repo.select(JOB_STATE_TABLE, columns="state", filters={"name": JOB_NAME}, limit=1)
+            if rows and rows[0].get("state"):
+                self._cursors = json.loads(rows[0]["state"]).get("cursors", {})
+        except RepositoryError as e:
+            # Without the table we still work, we just restart from "now"
+            logger.warning(f"⚠️ Could not load premium sweeper progress: {e}")
+        self._state_loaded = True
+
+    async def _save_state(self):
+        try:
+            await repo.upsert(JOB_STATE_TABLE, {
+                "name": JOB_NAME,
+                "state": json.dumps({"cursors": self._cursors}),
+                "updated_at": datetime.utcnow().isoformat()
+            }, on_conflict="name")
+        except RepositoryError as e:
+            logger.warning(f"⚠️ Could not save premium sweeper progress: {e}")
+
+    # ==================== EXPIRY ====================
+
+    async def expire(self) -> int:
+        """Flip is_premium off for every lapsed user in one batched update"""
+        now = datetime.utcnow().isoformat()
+        rows = await repo.update(
+            "users",
+            {"is_premium": False, "updated_at": now},
+            filters={"is_premium": True},
+            # No expiry at all never counted as premium either
+            where={"or": f"(premium_expires_at.lt.{now},premium_expires_at.is.null)"},
+            returning=USER_COLUMNS
+        )
+        for row in rows:
+            premium_cache.put(row["telegram_id"], None)
+        if rows:
+            stats_aggregator.record_expired(len(rows))
+            self.expired += len(rows)
+            logger.info(f"⌛ Premium expired for {len(rows)} user(s)")
+        return len(rows)
+
+    # ==================== REMINDERS ====================
+
+    async def _send(self, telegram_id: int, expires_at: datetime, days: int) -> bool:
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="⭐ Renew Premium", callback_data="get_premium")]
+        ])
+        text = (
+            f"⏳ Your Y.I.T Premium expires in {days} day(s), on {expires_at.strftime('%Y-%m-%d')}.\n\n"
+            f"Renew now to keep your ad-free experience!"
+        )
+        for attempt in range(2):
+            try:
+                await bot.send_message(telegram_id, text, reply_markup=keyboard)
+                return True
+            except TelegramRetryAfter as e:
+                if attempt == 0:
+                    await asyncio.sleep(e.retry_after)
+            except (TelegramForbiddenError, TelegramBadRequest):
+                # Blocked the bot or never started it: nothing to retry
+                return False
+        return False
+
+    async def remind(self, days: int) -> int:
+        """Remind everyone whose premium ends within `days` days and wasn't reminded yet"""
+        now = datetime.utcnow()
+        upper = (now + timedelta(days=days)).isoformat()
+        # Never reach back further than the window, e.g. after a long outage
+        floor = now + timedelta(days=days - 1)
+        stored = parse_timestamp(self._cursors.get(str(days)))
+        cursor = max(stored, floor).isoformat() if stored else floor.isoformat()
+        sent = 0
+
+        while True:
+            rows: List[dict] = await repo.select(
+                "users", columns="telegram_id,premium_expires_at", filters={"is_premium": True},
+                where={"premium_expires_at": f"gt.{cursor}", "and": f"(premium_expires_at.lte.{upper})"},
+                order="premium_expires_at.asc", limit=REMINDER_BATCH_SIZE
+            )
+            if not rows:
+                break
+
+            results = await asyncio.gather(*(
+                self._send(r["telegram_id"], parse_timestamp(r["premium_expires_at"]) or now, days)
+                for r in rows
+            ))
+            sent += sum(results)
+            self.reminders_sent += sum(results)
+            self.reminders_failed += len(results) - sum(results)
+
+            # Timestamps carry microseconds, so a page boundary never splits a tie
+            cursor = (parse_timestamp(rows[-1]["premium_expires_at"]) or now).isoformat()
+            self._cursors[str(days)] = cursor
+            await self._save_state()
+
+            if len(rows) < REMINDER_BATCH_SIZE:
+                break
+            await asyncio.sleep(REMINDER_BATCH_INTERVAL_SECONDS)
+
+        if sent:
+            logger.info(f"🔔 Sent {sent} premium reminder(s) ({days} day(s) left)")
+        return sent
+
+    # ==================== JOB ====================
+
+    async def sweep(self):
+        async with self._lock:
+            if not self._state_loaded:
+                await self._load_state()
+            await self.expire()
+            for days in PREMIUM_REMINDER_DAYS:
+                await self.remind(days)
+            self.sweeps += 1
+            self.last_sweep_at = datetime.utcnow()
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"❌ Premium sweep failed: {e}")
+            await asyncio.sleep(PREMIUM_SWEEP_SECONDS)
+
+    def start(self):
+        if self._task is None and repo and bot:
+            self._task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "last_sweep_at": self.last_sweep_at.isoformat() if self.last_sweep_at else None,
+            "sweeps": self.sweeps,
+            "expired": self.expired,
+            "reminders_sent": self.reminders_sent,
+            "reminders_failed": self.reminders_failed,
+            "errors": self.errors,
+            "cursors": dict(self._cursors)
+        }
+
+# Global sweeper, started by the leader worker
+premium_sweeper = PremiumSweeper()
@@ -0,0 +1,163 @@
+# ===================================================
+# FILE: ranking.py
+# FEED RANKING FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import math
+import zlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Strategy used for /api/videos (see STRATEGIES below)
+FEED_RANKING = os.environ.get("FEED_RANKING", "recency_views")
+# Number of precomputed jitter variants; each user is pinned to one
+RANKING_JITTER_BUCKETS = int(os.environ.get("RANKING_JITTER_BUCKETS", 16))
+RANKING_HALF_LIFE_HOURS = float(os.environ.get("RANKING_HALF_LIFE_HOURS", 72))
+
+def _timestamp(value: Optional[str]) -> float:
+    """created_at string -> UTC epoch seconds (0 if missing/invalid)"""
+    if not value:
+        return 0.0
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if dt.tzinfo is not None:
+            return dt.timestamp()
+        return (dt - datetime(1970, 1, 1)).total_seconds()
+    except ValueError:
+        return 0.0
+
+class CatalogFeatures:
+    """Column arrays of the inputs strategies score on"""
+
+    def __init__(self, rows: List[dict]):
+        self.created = np.array([_timestamp(r.get('created_at')) for r in rows], dtype=np.float64)
+        self.views = np.array([r.get('views') or 0 for r in rows], dtype=np.float64)
+
+# ==================== STRATEGIES ====================
+
+class RankingStrategy:
+    """Scores a whole catalog at once; higher score = earlier in the feed
+
+    Scores must not depend on the current time, so a catalog refresh keeps
+    existing cursors valid. `jitter` is the amplitude of the per-user noise.
+    """
+
+    name = "base"
+    jitter = 0.0
+
+    def scores(self, features: CatalogFeatures) -> np.ndarray:
+        raise NotImplementedError
+
+class RecencyStrategy(RankingStrategy):
+    """Newest first, no jitter"""
+
+    name = "recency"
+
+    def scores(self, features: CatalogFeatures) -> np.ndarray:
+        return features.created.copy()
+
+class RecencyViewsStrategy(RankingStrategy):
+    """Exponential recency decay boosted by view counts, with per-user jitter
+
+    In log space decay(age) = exp(-(now - t) / tau) is t / tau minus a
+    constant, so t / tau ranks the same without depending on `now`.
+    """
+
+    name = "recency_views"
+    jitter = 0.5
+
+    def __init__(self, half_life_hours: float = RANKING_HALF_LIFE_HOURS, views_weight: float = 0.3):
+        self.tau = half_life_hours * 3600 / math.log(2)
+        self.views_weight = views_weight
+
+    def scores(self, features: CatalogFeatures) -> np.ndarray:
+        return features.created / self.tau + self.views_weight * np.log1p(features.views)
+
+STRATEGIES = {
+    RecencyStrategy.name: RecencyStrategy,
+    RecencyViewsStrategy.name: RecencyViewsStrategy
+}
+
+def get_strategy(name: str = FEED_RANKING) -> RankingStrategy:
+    return STRATEGIES.get(name, RecencyViewsStrategy)()
+
+def user_bucket(user_id: Optional[int], buckets: int = RANKING_JITTER_BUCKETS) -> int:
+    """Stable jitter bucket for a user (0 for anonymous clients)"""
+    if user_id is None:
+        return 0
+    return zlib.crc32(str(user_id).encode()) % buckets
+
+# ==================== PRECOMPUTED FEED ====================
+
+class RankedFeed:
+    """Precomputed feed orders for one list of videos, one per jitter bucket
+
+    All scoring and sorting happens once here, as array operations; serving
+    a page is a searchsorted plus a slice.
+    """
+
+    def __init__(self, rows: List[dict], strategy: RankingStrategy,
+                 buckets: int = RANKING_JITTER_BUCKETS):
+        self.rows = rows
+        self.buckets = buckets if strategy.jitter else 1
+
+        # Dense ordinals (numeric ids) for seen-set filtering; -1 if not numeric
+        self.ordinals = np.array([r.get('id') if isinstance(r.get('id'), int) else -1 for r in rows], dtype=np.int64)
+
+        base = strategy.scores(CatalogFeatures(rows))
+        # Seeded per video id, so a video keeps its jitter across refreshes
+        ids = np.array([zlib.crc32(str(r.get('id')).encode()) for r in rows], dtype=np.uint64)
+        bucket_salt = np.arange(self.buckets, dtype=np.uint64)[:, None] << np.uint64(32)
+        noise = ((ids[None, :] ^ bucket_salt) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+        scores = base[None, :] + strategy.jitter * (noise / float(1 << 32))
+
+        # Stable sort keeps ties in catalog order (created_at, id descending)
+        self.orders = np.argsort(-scores, axis=1, kind="stable")
+        # Negated so each row is ascending for searchsorted
+        self.neg_scores = np.take_along_axis(-scores, self.orders, axis=1)
+
+    def page(self, bucket: int, after: Optional[tuple], limit: int,
+             exclude=None) -> Tuple[List[dict], Optional[tuple]]:
+        """Up to `limit` rows after the keyset position `after` = (score, id)
+
+        `exclude` is an optional seen-set (anything with a vectorized
+        contains(ordinals) -> bool array); matching rows are skipped.
+        """
+        bucket %= self.buckets
+        order = self.orders[bucket]
+        neg = self.neg_scores[bucket]
+
+        start = 0
+        if after is not None:
+            score, video_id = after
+            # Rows [lo, hi) share the cursor's score; resume right after its id
+            lo = int(np.searchsorted(neg, -score, side="left"))
+            hi = int(np.searchsorted(neg, -score, side="right"))
+            start = hi
+            for i in range(lo, hi):
+                if self.rows[order[i]].get('id') == video_id:
+                    start = i + 1
+                    break
+
+        if exclude is None:
+            idx = order[start:start + limit]
+            end = start + len(idx)
+        else:
+            # Scan forward in chunks, masking out seen rows with one bitwise test per chunk
+            idx, end = [], start
+            while len(idx) < limit and end < len(order):
+                chunk = order[end:end + limit * 2]
+                positions = np.flatnonzero(~exclude.contains(self.ordinals[chunk]))
+                positions = positions[:limit - len(idx)]
+                idx.extend(chunk[positions].tolist())
+                end += int(positions[-1]) + 1 if len(idx) == limit else len(chunk)
+
+        page = [self.rows[i] for i in idx]
+        # Continue after the last row scanned, so skipped rows are not rescanned
+        next_key = None
+        if start < end < len(order):
+            next_key = (float(-neg[end - 1]), self.rows[order[end - 1]].get('id'))
+        return page, next_key
@@ -0,0 +1,183 @@
+# ===================================================
+# FILE: ratelimit.py
+# ADMISSION CONTROL FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from metrics import http_rejected
+from utils import get_user_id_from_init_data
+from telegram_auth import stream_tokens
+
+# Per-client token buckets; the in-flight cap below is configured on its own
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Sustained requests per second per user (or IP), and how many may burst at once
+RATE_LIMIT_PER_SECOND = float(os.environ.get("RATE_LIMIT_PER_SECOND", 5))
+RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", 30))
+# Max clients tracked; the least recently seen are forgotten (i.e. refilled)
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", 50000))
+# Database-bound requests allowed in flight at once, per worker (0 disables the cap)
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", 200))
+OVERLOAD_RETRY_AFTER_SECONDS = 1
+
+# Mini-app routes, limited per Telegram user / client IP
+RATE_LIMITED_ROUTES = {
+    "/api/videos", "/api/videos/seen", "/api/check-premium", "/api/user-data",
+    "/api/premium/stream-token", "/api/premium/stream", "/api/premium/wait"
+}
+# Routes that may reach Supabase, bounded together. Webhooks are included:
+# Telegram redelivers an update we answer with 503. Streams and long-polls
+# mostly wait, so they are left to the premium hub's own limit.
+DB_BOUND_ROUTES = {
+    "/api/videos", "/api/check-premium", "/api/user-data",
+    "/webhook", "/api/telegram-webhook"
+}
+
+class TokenBuckets:
+    """Token bucket per key in one LRU-ordered dict: O(1) per call, bounded memory
+
+    Buckets refill lazily on access; an evicted key simply starts full again,
+    which only ever errs on the side of letting a request through.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: float = RATE_LIMIT_BURST,
+                 max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> [tokens, last refill (monotonic seconds)]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+        # Counters
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def take(self, key: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """Spend `cost` tokens; returns (allowed, seconds until it would be)"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            self.allowed += 1
+            return True, 0.0
+        self.rejected += 1
+        return False, (cost - bucket[0]) / self.rate
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evictions": self.evictions
+        }
+
+def _client_key(scope) -> str:
+    """Telegram user of the request if its initData or stream token verifies, else the client IP
+
+    Behind Render's proxy the peer is the proxy; the last X-Forwarded-For hop
+    is the address it saw, which (unlike the first) the client can't forge.
+    """
+    headers = dict(scope.get("headers") or ())
+    init_data = headers.get(b"x-telegram-init-data", b"").decode("latin-1")
+    user_id = get_user_id_from_init_data(init_data) if init_data else None
+    if not user_id and b"token=" in scope.get("query_string", b""):
+        user_id = stream_tokens.verify(parse_qs(scope["query_string"].decode("latin-1")).get("token", [""])[0])
+    if user_id:
+        return f"user:{user_id}"
+
+    forwarded = headers.get(b"x-forwarded-for")
+    if forwarded:
+        return "ip:" + forwarded.decode("latin-1").rsplit(",", 1)[-1].strip()
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "ip:unknown"
+
+class AdmissionControl:
+    """Per-client token buckets plus a global cap on database-bound requests in flight"""
+
+    def __init__(self, buckets: TokenBuckets, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT):
+        self.buckets = buckets
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    def stats(self) -> dict:
+        return {
+            "rate_limit_enabled": RATE_LIMIT_ENABLED,
+            "cap_enabled": self.max_in_flight > 0,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "buckets": self.buckets.stats()
+        }
+
+class AdmissionMiddleware:
+    """ASGI middleware enforcing AdmissionControl on the routes listed above
+
+    Over its rate a client gets 429, and over max_in_flight every
+    database-bound request gets 503; both carry Retry-After. Limits are
+    per worker process. RATE_LIMIT_ENABLED switches only the 429s; the
+    in-flight cap stays on unless ADMISSION_MAX_IN_FLIGHT is 0.
+    """
+
+    def __init__(self, app, control: Optional[AdmissionControl] = None):
+        self.app = app
+        self.control = control or admission
+
+    async def _reject(self, send, status: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        control = self.control
+        path = scope["path"]
+        if RATE_LIMIT_ENABLED and path in RATE_LIMITED_ROUTES:
+            allowed, retry_after = control.buckets.take(_client_key(scope))
+            if not allowed:
+                http_rejected.inc(path, "rate_limit")
+                await self._reject(send, 429, "Too many requests", retry_after)
+                return
+
+        if path not in DB_BOUND_ROUTES or control.max_in_flight <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        if control.in_flight >= control.max_in_flight:
+            http_rejected.inc(path, "overload")
+            await self._reject(send, 503, "Server busy", OVERLOAD_RETRY_AFTER_SECONDS)
+            return
+        control.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            control.in_flight -= 1
+
+# Global admission state for this worker
+admission = AdmissionControl(TokenBuckets())
@@ -0,0 +1,348 @@
+# ===================================================
+# FILE: replica.py
+# LOCAL SQLITE READ REPLICA FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from shared import logger
+from repository import repo
+
+REPLICA_ENABLED = os.environ.get("REPLICA_ENABLED", "true").lower() == "true"
+REPLICA_PATH = os.environ.get("REPLICA_PATH", os.path.join(tempfile.gettempdir(), "yitio_replica.sqlite3"))
+# Incremental sync interval
+REPLICA_SYNC_SECONDS = float(os.environ.get("REPLICA_SYNC_SECONDS", 15))
+# Reads go to Supabase if the last successful sync is older than this
+REPLICA_MAX_STALENESS_SECONDS = float(os.environ.get("REPLICA_MAX_STALENESS_SECONDS", 120))
+# Full resync (catches deletes and edits that don't move the high-water marks)
+REPLICA_FULL_SYNC_SECONDS = float(os.environ.get("REPLICA_FULL_SYNC_SECONDS", 3600))
+REPLICA_PAGE_SIZE = int(os.environ.get("REPLICA_PAGE_SIZE", 1000))
+
+USER_COLUMNS = "telegram_id,is_premium,premium_expires_at,updated_at"
+# Busy timeout of the connection a full reload runs on, off the event loop
+REPLICA_RELOAD_TIMEOUT_SECONDS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    platform TEXT,
+    url TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS videos_feed ON videos (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS videos_platform ON videos (platform, created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS users (
+    telegram_id INTEGER PRIMARY KEY,
+    is_premium INTEGER,
+    premium_expires_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS users_premium ON users (is_premium);
+CREATE INDEX IF NOT EXISTS users_premium_expiry ON users (premium_expires_at) WHERE is_premium = 1;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def _as_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.lower() == "true"
+    return bool(value)
+
+def _put_videos(db: sqlite3.Connection, rows: List[dict]):
+    db.executemany(
+        "INSERT OR REPLACE INTO videos (id, platform, url, created_at, data) VALUES (?, ?, ?, ?, ?)",
+        [(r.get("id"), r.get("platform"), r.get("url"), r.get("created_at"), json.dumps(r, default=str))
+         for r in rows if isinstance(r.get("id"), int)]
+    )
+
+def _put_users(db: sqlite3.Connection, rows: List[dict]):
+    """Upsert only the columns present, so a partial row can't null the others
+
+    Rows are grouped by which columns they carry, one executemany per group.
+    """
+    groups: Dict[Tuple[str, ...], list] = {}
+    for r in rows:
+        if r.get("telegram_id") is None:
+            continue
+        columns = tuple(c for c in ("is_premium", "premium_expires_at", "updated_at") if c in r)
+        values = [int(_as_bool(r[c])) if c == "is_premium" else r[c] for c in columns]
+        groups.setdefault(columns, []).append((r["telegram_id"], *values))
+
+    for columns, params in groups.items():
+        names = ", ".join(("telegram_id",) + columns)
+        placeholders = ", ".join("?" * (len(columns) + 1))
+        action = ("DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in columns)) if columns else "DO NOTHING"
+        db.executemany(
+            f"INSERT INTO users ({names}) VALUES ({placeholders}) ON CONFLICT(telegram_id) {action}", params
+        )
+
+class ReadReplica:
+    """SQLite (WAL) copy of `videos` and the premium columns of `users`
+
+    Kept current by incremental pulls on created_at / updated_at high-water
+    marks plus write-through of our own inserts and upserts. With several
+    workers they all share the file and write through; only the leader runs
+    the sync loop (freshness is read from the shared meta table). Every read
+    method falls back to Supabase when the replica is disabled or staler
+    than REPLICA_MAX_STALENESS_SECONDS. Reads, write-through and
+    incremental pages are small indexed SQLite calls and run directly on
+    the event loop; a full reload rewrites whole tables, so it runs in a
+    thread on its own connection.
+    """
+
+    def __init__(self, path: str = REPLICA_PATH, max_staleness: float = REPLICA_MAX_STALENESS_SECONDS):
+        self.path = path
+        self.max_staleness = max_staleness
+        self._db: Optional[sqlite3.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        # Counters
+        self.local_reads = 0
+        self.fallback_reads = 0
+        self.syncs = 0
+        self.sync_errors = 0
+        self.rows_pulled = 0
+        self.rows_written_through = 0
+
+    # ==================== STORAGE ====================
+
+    def open(self):
+        if self._db is not None:
+            return
+        # Other workers may hold the write lock briefly
+        self._db = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        logger.info(f"✅ Read replica opened at {self.path}")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    @contextmanager
+    def _transaction(self):
+        self._db.execute("BEGIN")
+        try:
+            yield
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def apply_write(self, table: str, rows: List[dict]):
+        """Write-through hook for our own writes (see repo.add_write_listener)"""
+        if self._db is None or table not in ("videos", "users"):
+            return
+        with self._transaction():
+            (_put_videos if table == "videos" else _put_users)(self._db, rows)
+        self.rows_written_through += len(rows)
+
+    # ==================== SYNC ====================
+
+    async def _pull(self, table: str, columns: str, column: str, key: str,
+                    mark: Optional[str], put) -> Optional[str]:
+        """Fetch rows with `column` >= mark in pages; returns the new high-water mark
+
+        Pages follow the (column, key) keyset, so rows sharing one timestamp
+        are never skipped however many of them there are. Each sync restarts
+        at the mark itself, re-reading the rows that carry it.
+        """
+        after = None
+        order = f"{column}.asc,{key}.asc"
+        while True:
+            if after is not None:
+                where = {"or": f'({column}.gt."{mark}",and({column}.eq."{mark}",{key}.gt.{after}))'}
+            elif mark:
+                where = {column: f"gte.{mark}"}
+            else:
+                where = {column: "not.is.null"}
+            rows = await repo.select(table, columns=columns, where=where, order=order, limit=REPLICA_PAGE_SIZE)
+            with self._transaction():
+                put(self._db, rows)
+            self.rows_pulled += len(rows)
+
+            last = rows[-1] if rows else None
+            if len(rows) < REPLICA_PAGE_SIZE or last is None or last.get(column) is None:
+                return (last or {}).get(column) or mark
+            mark, after = last[column], last[key]
+
+    def _replace_table(self, table: str, put, rows: List[dict]):
+        """Swap a table's contents in one transaction, on a connection of its own
+
+        Runs in a worker thread. Readers see the old copy until it commits;
+        writers (write-through, other workers) wait on the lock meanwhile.
+        """
+        db = sqlite3.connect(self.path, isolation_level=None, timeout=REPLICA_RELOAD_TIMEOUT_SECONDS)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute(f"DELETE FROM {table}")
+                put(db, rows)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        finally:
+            db.close()
+
+    async def _full_pull(self, table: str, columns: str, key: str, put):
+        """Reload a table in primary-key pages (keyset), replacing the local copy"""
+        after = None
+        rows_all: List[dict] = []
+        while True:
+            where = {key: f"gt.{after}"} if after is not None else None
+            rows = await repo.select(table, columns=columns, where=where,
+                                     order=f"{key}.asc", limit=REPLICA_PAGE_SIZE)
+            rows_all.extend(rows)
+            if len(rows) < REPLICA_PAGE_SIZE:
+                break
+            after = rows[-1].get(key)
+
+        await asyncio.to_thread(self._replace_table, table, put, rows_all)
+        self.rows_pulled += len(rows_all)
+        return max((r.get("created_at" if table == "videos" else "updated_at") or "" for r in rows_all),
+                   default="") or None
+
+    async def sync(self, full: bool = False):
+        """Bring both tables up to date from Supabase"""
+        if self._db is None or not repo:
+            return
+        async with self._lock:
+            last_full = float(self._meta("last_full_sync") or 0)
+            full = full or time.time() - last_full > REPLICA_FULL_SYNC_SECONDS
+            try:
+                if full:
+                    videos_mark, users_mark = await asyncio.gather(
+                        self._full_pull("videos", "*", "id", _put_videos),
+                        self._full_pull("users", USER_COLUMNS, "telegram_id", _put_users)
+                    )
+                    self._set_meta("last_full_sync", time.time())
+                else:
+                    videos_mark, users_mark = await asyncio.gather(
+                        self._pull("videos", "*", "created_at", "id", self._meta("videos_mark"), _put_videos),
+                        self._pull("users", USER_COLUMNS, "updated_at", "telegram_id", self._meta("users_mark"), _put_users)
+                    )
+            except Exception as e:
+                self.sync_errors += 1
+                logger.error(f"❌ Replica sync failed: {e}")
+                return
+
+            if videos_mark:
+                self._set_meta("videos_mark", videos_mark)
+            if users_mark:
+                self._set_meta("users_mark", users_mark)
+            self._set_meta("last_sync", time.time())
+            self.syncs += 1
+
+    async def _sync_loop(self):
+        while True:
+            await self.sync()
+            await asyncio.sleep(REPLICA_SYNC_SECONDS)
+
+    def start(self):
+        """Open the replica and write our own changes through to it"""
+        if not REPLICA_ENABLED or not repo or self._db is not None:
+            return
+        self.open()
+        repo.add_write_listener(self.apply_write)
+
+    def start_sync(self):
+        """Run the sync loop (leader worker only)"""
+        if self._db is None or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.close()
+
+    # ==================== READS ====================
+
+    def is_fresh(self) -> bool:
+        if self._db is None:
+            return False
+        last_sync = float(self._meta("last_sync") or 0)
+        return time.time() - last_sync <= self.max_staleness
+
+    def _local(self) -> bool:
+        if self.is_fresh():
+            self.local_reads += 1
+            return True
+        self.fallback_reads += 1
+        return False
+
+    async def list_videos(self) -> List[dict]:
+        """Every video, newest first"""
+        if not self._local():
+            return await repo.list_videos()
+        cursor = self._db.execute("SELECT data FROM videos ORDER BY created_at DESC, id DESC")
+        return [json.loads(data) for (data,) in cursor]
+
+    async def get_user_premium(self, telegram_id: int) -> Optional[dict]:
+        """Premium columns of a user, or None if the user is unknown"""
+        if not self._local():
+            return await repo.get_user_premium(telegram_id)
+        row = self._db.execute(
+            "SELECT telegram_id, is_premium, premium_expires_at FROM users WHERE telegram_id = ?",
+            (telegram_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"telegram_id": row[0], "is_premium": bool(row[1]), "premium_expires_at": row[2]}
+
+    async def count_videos(self, platform: Optional[str] = None) -> int:
+        if not self._local():
+            return await repo.count_videos(platform)
+        if platform:
+            return self._db.execute("SELECT COUNT(*) FROM videos WHERE platform = ?", (platform,)).fetchone()[0]
+        return self._db.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    async def count_users(self, premium_only: bool = False) -> int:
+        if not self._local():
+            return await repo.count_users(premium_only)
+        if premium_only:
+            return self._db.execute("SELECT COUNT(*) FROM users WHERE is_premium = 1").fetchone()[0]
+        return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def stats(self) -> dict:
+        last_sync = float(self._meta("last_sync") or 0) if self._db is not None else 0
+        return {
+            "enabled": self._db is not None,
+            "fresh": self.is_fresh(),
+            "seconds_since_sync": round(time.time() - last_sync, 1) if last_sync else None,
+            "local_reads": self.local_reads,
+            "fallback_reads": self.fallback_reads,
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+            "rows_pulled": self.rows_pulled,
+            "rows_written_through": self.rows_written_through
+        }
+
+# Global replica; reads fall back to Supabase until it has synced
+read_replica = ReadReplica()
@@ -0,0 +1,218 @@
+# ===================================================
+# FILE: repository.py
+# ASYNC DATA ACCESS LAYER FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+
+from shared import logger, SUPABASE_URL, SUPABASE_KEY
+from http_clients import http_clients
+from metrics import db_latency, db_errors
+from singleflight import SingleFlight
+
+# Connection pool / timeout settings (keep-alive and DNS cache: see http_clients.py)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 20))
+DB_TIMEOUT_SECONDS = float(os.environ.get("DB_TIMEOUT_SECONDS", 10))
+
+class RepositoryError(Exception):
+    """Raised when Supabase rejects or fails a request"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Supabase error {status}: {message}")
+        self.status = status
+
+def _encode_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "null"
+    return str(value)
+
+def _eq_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Turn {"column": value} into PostgREST equality filters"""
+    params = {}
+    for column, value in (filters or {}).items():
+        op = "is" if value is None else "eq"
+        params[column] = f"{op}.{_encode_value(value)}"
+    return params
+
+# HTTP method -> operation label for query metrics
+_OPERATIONS = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+class SupabaseRepository:
+    """Non-blocking access to the Supabase REST API (PostgREST)
+
+    Every call goes through the "supabase" pool of the shared HTTP client
+    registry, so queries from concurrent handlers overlap instead of blocking
+    the event loop. Identical reads (GET/HEAD) in flight at the same time
+    share one call.
+    """
+
+    def __init__(self, url: str, key: str, pool_size: int = DB_POOL_SIZE,
+                 timeout: float = DB_TIMEOUT_SECONDS):
+        self.base_url = f"{url.rstrip('/')}/rest/v1"
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._headers = {
+            "apikey": key,
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/json"
+        }
+        self._write_listeners: List[Callable[[str, List[dict]], None]] = []
+        self.reads = SingleFlight("supabase")
+        http_clients.register("supabase", limit=pool_size, limit_per_host=pool_size,
+                              timeout=timeout, headers=self._headers)
+
+    async def _request(self, method: str, table: str, params: Optional[dict] = None,
+                       json: Any = None, headers: Optional[dict] = None,
+                       timeout: Optional[float] = None):
+        """Run one PostgREST call; returns (json body or None, response headers)"""
+        if method in ("GET", "HEAD"):
+            key = (method, table, tuple(sorted((params or {}).items())), tuple(sorted((headers or {}).items())))
+            return await self.reads.do(key, lambda: self._send(method, table, params, json, headers, timeout))
+        return await self._send(method, table, params, json, headers, timeout)
+
+    async def _send(self, method: str, table: str, params: Optional[dict], json: Any,
+                    headers: Optional[dict], timeout: Optional[float]):
+        op = _OPERATIONS.get(method, method.lower())
+        if op == "insert" and params and "on_conflict" in params:
+            op = "upsert"
+        started = time.perf_counter()
+        try:
+            client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+            async with http_clients.request("supabase", method, f"{self.base_url}/{table}", params=params,
+                                            json=json, headers=headers, timeout=client_timeout) as response:
+                if response.status >= 400:
+                    raise RepositoryError(response.status, (await response.text())[:500])
+                body = None
+                if response.status != 204 and method != "HEAD":
+                    body = await response.json(content_type=None)
+                return body, response.headers
+        except Exception:
+            db_errors.inc(table, op)
+            raise
+        finally:
+            db_latency.observe(time.perf_counter() - started, table, op)
+
+    # ==================== GENERIC OPERATIONS ====================
+
+    async def select(self, table: str, columns: str = "*", filters: Optional[Dict[str, Any]] = None,
+                     order: Optional[str] = None, limit: Optional[int] = None,
+                     timeout: Optional[float] = None, where: Optional[Dict[str, str]] = None) -> List[dict]:
+        """`filters` are equality matches; `where` takes raw PostgREST
+        expressions such as {"created_at": "gte.2024-01-01"}"""
+        params = {"select": columns, **_eq_filters(filters), **(where or {})}
+        if order:
+            params["order"] = order
+        if limit is not None:
+            params["limit"] = str(limit)
+        body, _ = await self._request("GET", table, params=params, timeout=timeout)
+        # Coalesced callers share the body; each gets its own list
+        return list(body or [])
+
+    async def count(self, table: str, filters: Optional[Dict[str, Any]] = None,
+                    timeout: Optional[float] = None) -> int:
+        params = {"select": "*", **_eq_filters(filters)}
+        _, headers = await self._request("HEAD", table, params=params,
+                                         headers={"Prefer": "count=exact"}, timeout=timeout)
+        # Content-Range looks like "0-24/3573" or "*/0"
+        content_range = headers.get("Content-Range", "")
+        total = content_range.rsplit("/", 1)[-1]
+        return int(total) if total.isdigit() else 0
+
+    async def insert(self, table: str, rows: Any, timeout: Optional[float] = None) -> List[dict]:
+        body, _ = await self._request("POST", table, json=rows,
+                                      headers={"Prefer": "return=representation"}, timeout=timeout)
+        self._written(table, body)
+        return body or []
+
+    async def upsert(self, table: str, rows: Any, on_conflict: str,
+                     timeout: Optional[float] = None) -> List[dict]:
+        body, _ = await self._request(
+            "POST", table, params={"on_conflict": on_conflict}, json=rows,
+            headers={"Prefer": "resolution=merge-duplicates,return=representation"},
+            timeout=timeout
+        )
+        self._written(table, body)
+        return body or []
+
+    async def update(self, table: str, values: dict, filters: Optional[Dict[str, Any]] = None,
+                     where: Optional[Dict[str, str]] = None, returning: str = "*",
+                     timeout: Optional[float] = None) -> List[dict]:
+        """PATCH every row matching `filters`/`where` in one statement; returns
+        the updated rows (`returning` columns only)"""
+        params = {"select": returning, **_eq_filters(filters), **(where or {})}
+        body, _ = await self._request("PATCH", table, params=params, json=values,
+                                      headers={"Prefer": "return=representation"}, timeout=timeout)
+        self._written(table, body)
+        return body or []
+
+    def add_write_listener(self, listener: Callable[[str, List[dict]], None]):
+        """Call listener(table, rows) with the stored rows after every insert/upsert/update"""
+        self._write_listeners.append(listener)
+
+    def _written(self, table: str, body: Any):
+        if not body or not self._write_listeners:
+            return
+        rows = body if isinstance(body, list) else [body]
+        for listener in self._write_listeners:
+            try:
+                listener(table, rows)
+            except Exception as e:
+                logger.error(f"❌ Write listener failed for {table}: {e}")
+
+    # ==================== APP QUERIES ====================
+
+    async def list_videos(self) -> List[dict]:
+        """Every video, newest first"""
+        return await self.select("videos", order="created_at.desc,id.desc")
+
+    async def find_video_by_url(self, url: str) -> Optional[dict]:
+        rows = await self.select("videos", columns="id,url", filters={"url": url}, limit=1)
+        return rows[0] if rows else None
+
+    async def insert_video(self, row: dict) -> List[dict]:
+        return await self.insert("videos", row)
+
+    async def get_user_premium(self, telegram_id: int) -> Optional[dict]:
+        """Premium columns of a user, or None if the user is unknown"""
+        rows = await self.select("users", columns="telegram_id,is_premium,premium_expires_at",
+                                 filters={"telegram_id": telegram_id}, limit=1)
+        return rows[0] if rows else None
+
+    async def insert_payment(self, row: dict) -> List[dict]:
+        return await self.insert("payments", row)
+
+    async def upsert_user(self, row: dict) -> List[dict]:
+        return await self.upsert("users", row, on_conflict="telegram_id")
+
+    async def count_videos(self, platform: Optional[str] = None) -> int:
+        return await self.count("videos", {"platform": platform} if platform else None)
+
+    async def count_users(self, premium_only: bool = False) -> int:
+        return await self.count("users", {"is_premium": True} if premium_only else None)
+
+    async def completed_payments(self) -> List[dict]:
+        return await self.select("payments", columns="amount,currency", filters={"status": "completed"})
+
+    async def revenue_by_currency(self) -> Dict[str, int]:
+        """Sum of completed payments per currency"""
+        try:
+            # Aggregated in Postgres when the project has PostgREST aggregates enabled
+            rows = await self.select("payments", columns="currency,amount.sum()", filters={"status": "completed"})
+            return {r.get("currency"): r.get("sum") or 0 for r in rows}
+        except RepositoryError:
+            totals: Dict[str, int] = {}
+            for p in await self.completed_payments():
+                totals[p.get("currency")] = totals.get(p.get("currency"), 0) + (p.get("amount") or 0)
+            return totals
+
+# Global repository instance (None if Supabase is not configured)
+repo: Optional[SupabaseRepository] = None
+if SUPABASE_URL and SUPABASE_KEY:
+    repo = SupabaseRepository(SUPABASE_URL, SUPABASE_KEY)
+    logger.info("✅ Supabase repository configured")
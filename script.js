@@ -5,8 +5,21 @@ let activeSwiper = null;
 
 const SEEN_LIMIT = 50;
 const SEEN_KEY = "yitio-seen-history";
-const PREMIUM_CHECK_INTERVAL = 30000;
-let premiumCheckInterval = null;
+const PREMIUM_RETRY_DELAY = 5000;
+let premiumEventSource = null;
+let premiumWatchActive = false;
+
+// Feed pagination
+const FEED_PAGE_SIZE = 30;
+// Projected rows: only the fields the feed uses, with the video id pre-extracted
+const FEED_FORMAT = "compact";
+let nextCursor = null;
+let isLoadingMore = false;
+// Newest created_at the feed has shown (for ?since= delta requests)
+let feedLatest = null;
+// Last response per request URL, revalidated with If-None-Match
+const FEED_CACHE_KEY = "yitio-feed-cache";
+const feedCache = new Map(Object.entries(JSON.parse(localStorage.getItem(FEED_CACHE_KEY) || "{}")));
 
 // YouTube Player API tracking
 let youtubePlayers = new Map(); // slideIndex -> YT.Player instance
@@ -15,6 +28,39 @@ let hasUserInteracted = false;
 let isFirstInteraction = true;
 
 // --- HISTORY TRACKING ---
+const SEEN_SYNC_DELAY = 5000;
+let pendingSeenIds = [];
+let seenSyncTimer = null;
+
+function getInitData() {
+    return window.Telegram?.WebApp?.initData || "";
+}
+
+// Batch watched catalog ids to the server, which filters them out of the feed
+function queueSeenSync(dbId) {
+    if (!dbId || !getInitData()) return;
+    pendingSeenIds.push(Number(dbId));
+    if (!seenSyncTimer) seenSyncTimer = setTimeout(flushSeenSync, SEEN_SYNC_DELAY);
+}
+
+function flushSeenSync() {
+    clearTimeout(seenSyncTimer);
+    seenSyncTimer = null;
+    if (pendingSeenIds.length === 0) return;
+    
+    const videoIds = pendingSeenIds;
+    pendingSeenIds = [];
+    fetch(`${API_URL}/api/videos/seen`, {
+        method: 'POST',
+        keepalive: true,
+        headers: {
+            'Content-Type': 'application/json',
+            'X-Telegram-Init-Data': getInitData()
+        },
+        body: JSON.stringify({ video_ids: videoIds })
+    }).catch(error => console.log("Error syncing seen videos:", error));
+}
+
 function getSeenList() {
     try { return JSON.parse(localStorage.getItem(SEEN_KEY) || "[]"); } 
     catch { return []; }
@@ -171,36 +217,67 @@ function toggleVideoPlayback(index) {
 }
 
 // --- CORE FEED LOGIC ---
-async function loadFeed() {
-    const feed = document.getElementById('feed');
+// GET an /api/videos URL, reusing the cached body when the server answers 304
+async function fetchFeed(params) {
+    const url = `${API_URL}/api/videos?${params}`;
+    const initData = getInitData();
+    const headers = initData ? { 'X-Telegram-Init-Data': initData } : {};
+    const cached = feedCache.get(url);
+    if (cached) headers['If-None-Match'] = cached.etag;
     
-    feed.innerHTML = '<div class="swiper-slide" style="display:flex; align-items:center; justify-content:center;"><h3>Loading videos...</h3></div>';
+    const res = await fetch(url, { headers });
+    if (res.status === 304 && cached) return cached.body;
+    
+    const body = await res.json();
+    const etag = res.headers.get('ETag');
+    if (etag) {
+        feedCache.set(url, { etag, body });
+        if (feedCache.size > 50) feedCache.delete(feedCache.keys().next().value);
+        // Only the first page is worth keeping across app launches
+        if (!params.get('cursor') && !params.get('since')) {
+            localStorage.setItem(FEED_CACHE_KEY, JSON.stringify({ [url]: { etag, body } }));
+        }
+    }
+    return body;
+}
 
-    try {
-        const res = await fetch(`${API_URL}/api/videos?category=YouTube`);
-        let data = await res.json();
+function trackLatest(videos) {
+    for (const item of videos) {
+        if (item.created_at && (!feedLatest || item.created_at > feedLatest)) feedLatest = item.created_at;
+    }
+}
 
-        if (data && data.length > 0) {
-            const seenList = getSeenList();
-            const uniqueData = data.filter(item => !seenList.includes(item.url));
-            if (uniqueData.length > 0) data = uniqueData;
-        }
-        
-        if (!data || data.length === 0) {
-            feed.innerHTML = '<div class="swiper-slide" style="display:flex; align-items:center; justify-content:center;"><h3>No videos found</h3></div>';
-            return;
-        }
+function dropSeen(data) {
+    if (data.length > 0) {
+        const seenList = getSeenList();
+        const uniqueData = data.filter(item => !seenList.includes(item.url));
+        if (uniqueData.length > 0) data = uniqueData;
+    }
+    return data;
+}
 
-        // Clear existing players
-        youtubePlayers.clear();
-        currentPlayingIndex = -1;
-        
-        // Create slide HTML without iframes - we'll add players after
-        feed.innerHTML = data.map((item, index) => {
-            const videoId = extractVideoId(item.url);
-            return `
+async function fetchFeedPage(cursor) {
+    const params = new URLSearchParams({ category: "YouTube", limit: FEED_PAGE_SIZE, cursor: cursor || "", format: FEED_FORMAT });
+    const page = await fetchFeed(params);
+    trackLatest(page.videos || []);
+    return { videos: dropSeen(page.videos || []), nextCursor: page.next_cursor || null };
+}
+
+// Only the videos added since the newest one we have shown
+async function fetchNewVideos() {
+    if (!feedLatest) return { videos: [], hasMore: false };
+    const params = new URLSearchParams({ category: "YouTube", limit: FEED_PAGE_SIZE, since: feedLatest, format: FEED_FORMAT });
+    const page = await fetchFeed(params);
+    trackLatest(page.videos || []);
+    return { videos: dropSeen(page.videos || []), hasMore: !!page.has_more };
+}
+
+function renderSlide(item, index) {
+    // Compact rows carry the id pre-extracted by the server
+    const videoId = item.video_id || extractVideoId(item.url);
+    return `
             <div class="swiper-slide">
-                <div class="video-container" data-video-id="${videoId}" data-index="${index}">
+                <div class="video-container" data-video-id="${videoId}" data-db-id="${item.id}" data-index="${index}">
                     <!-- YouTube player will be inserted here -->
                     <div id="player-${index}" class="youtube-player"></div>
                     
@@ -215,7 +292,58 @@ async function loadFeed() {
                 </div>
             </div>
             `;
-        }).join('');
+}
+
+// Append the next page to the running feed instead of rebuilding it
+async function loadMoreVideos() {
+    if (isLoadingMore || !activeSwiper) return;
+    
+    isLoadingMore = true;
+    try {
+        let page;
+        if (nextCursor) {
+            page = await fetchFeedPage(nextCursor);
+            nextCursor = page.nextCursor;
+        } else {
+            // End of the catalog: show anything added meanwhile, else start over
+            const fresh = await fetchNewVideos();
+            if (fresh.videos.length === 0 || fresh.hasMore) {
+                setTimeout(() => loadFeed(), 1000);
+                return;
+            }
+            page = fresh;
+        }
+        
+        const offset = activeSwiper.slides.length;
+        activeSwiper.appendSlide(page.videos.map((item, i) => renderSlide(item, offset + i)));
+    } catch (e) {
+        console.error("Error loading more videos:", e);
+    } finally {
+        isLoadingMore = false;
+    }
+}
+
+async function loadFeed() {
+    const feed = document.getElementById('feed');
+    
+    feed.innerHTML = '<div class="swiper-slide" style="display:flex; align-items:center; justify-content:center;"><h3>Loading videos...</h3></div>';
+
+    try {
+        const page = await fetchFeedPage(null);
+        const data = page.videos;
+        nextCursor = page.nextCursor;
+        
+        if (!data || data.length === 0) {
+            feed.innerHTML = '<div class="swiper-slide" style="display:flex; align-items:center; justify-content:center;"><h3>No videos found</h3></div>';
+            return;
+        }
+
+        // Clear existing players
+        youtubePlayers.clear();
+        currentPlayingIndex = -1;
+        
+        // Create slide HTML without iframes - we'll add players after
+        feed.innerHTML = data.map(renderSlide).join('');
 
         // Destroy old swiper
         if (activeSwiper) {
@@ -250,7 +378,7 @@ async function loadFeed() {
             preventInteractionOnTransition: true,
             on: {
                 reachEnd: function () {
-                    setTimeout(() => loadFeed(), 1000);
+                    loadMoreVideos();
                 },
                 slideChange: function () {
                     const newIndex = this.activeIndex;
@@ -271,6 +399,7 @@ async function loadFeed() {
                     if (videoId) {
                         trackSeenVideo(`https://youtube.com/watch?v=${videoId}`);
                     }
+                    queueSeenSync(videoContainer?.dataset.dbId);
                     
                     maybeShowAd();
                 },
@@ -383,51 +512,96 @@ async function verifyPremiumStatus() {
     }
 }
 
-function startPremiumChecking(userId) {
+// Short-lived token for the stream URL, so initData never appears in a URL
+async function getStreamToken() {
+    const response = await fetch(`${API_URL}/api/premium/stream-token`, {
+        method: 'POST',
+        headers: { 'X-Telegram-Init-Data': getInitData() }
+    });
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    return (await response.json()).token;
+}
+
+// Wait for the bot to confirm payment: one SSE subscription instead of polling
+async function startPremiumChecking(userId) {
     stopPremiumChecking();
+    premiumWatchActive = true;
+    
+    if (!window.EventSource) {
+        waitForPremium(userId);
+        return;
+    }
     
-    checkPremiumStatus(userId);
+    let token;
+    try {
+        token = await getStreamToken();
+    } catch (error) {
+        console.log("Error getting stream token:", error);
+        waitForPremium(userId);
+        return;
+    }
+    // Stopped, or restarted by a later call, while the token was on its way
+    if (!premiumWatchActive || premiumEventSource) return;
     
-    premiumCheckInterval = setInterval(() => {
-        checkPremiumStatus(userId);
-    }, PREMIUM_CHECK_INTERVAL);
+    premiumEventSource = new EventSource(`${API_URL}/api/premium/stream?token=${encodeURIComponent(token)}`);
+    premiumEventSource.addEventListener('premium', (event) => {
+        onPremiumActivated(JSON.parse(event.data));
+    });
+    premiumEventSource.onerror = () => {
+        // EventSource retries on its own; only fall back once it gives up
+        if (premiumEventSource && premiumEventSource.readyState === EventSource.CLOSED) {
+            premiumEventSource = null;
+            if (premiumWatchActive) waitForPremium(userId);
+        }
+    };
 }
 
 function stopPremiumChecking() {
-    if (premiumCheckInterval) {
-        clearInterval(premiumCheckInterval);
-        premiumCheckInterval = null;
+    premiumWatchActive = false;
+    if (premiumEventSource) {
+        premiumEventSource.close();
+        premiumEventSource = null;
     }
 }
 
-async function checkPremiumStatus(userId) {
-    try {
-        const response = await fetch(`${API_URL}/api/check-premium?user_id=${userId}`);
-        const data = await response.json();
-        
-        if (data.is_premium) {
-            localStorage.setItem("isPremium", "true");
-            localStorage.setItem("premiumExpires", data.expires_at);
-            updatePremiumUI(true);
-            stopPremiumChecking();
+// Long-poll fallback for clients without EventSource
+async function waitForPremium(userId) {
+    while (premiumWatchActive) {
+        try {
+            const response = await fetch(`${API_URL}/api/premium/wait?timeout=25`, {
+                headers: { 'X-Telegram-Init-Data': getInitData() }
+            });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
             
-            const statusEl = document.getElementById('paymentStatus');
-            if (statusEl) {
-                statusEl.textContent = "✅ Premium activated! Refreshing...";
-                statusEl.style.color = "#4CAF50";
-                
-                setTimeout(() => {
-                    loadFeed();
-                    closePremium();
-                }, 2000);
+            const data = await response.json();
+            if (data.is_premium) {
+                onPremiumActivated(data);
+                return;
             }
-            
-            return true;
+        } catch (error) {
+            console.log("Error waiting for premium status:", error);
+            await new Promise(resolve => setTimeout(resolve, PREMIUM_RETRY_DELAY));
         }
-        return false;
-    } catch (error) {
-        console.log("Error checking premium status:", error);
-        return false;
+    }
+}
+
+function onPremiumActivated(data) {
+    if (!premiumWatchActive) return;
+    
+    localStorage.setItem("isPremium", "true");
+    localStorage.setItem("premiumExpires", data.expires_at);
+    updatePremiumUI(true);
+    stopPremiumChecking();
+    
+    const statusEl = document.getElementById('paymentStatus');
+    if (statusEl) {
+        statusEl.textContent = "✅ Premium activated! Refreshing...";
+        statusEl.style.color = "#4CAF50";
+        
+        setTimeout(() => {
+            loadFeed();
+            closePremium();
+        }, 2000);
     }
 }
 
@@ -692,6 +866,9 @@ window.onload = async () => {
 
 // Cleanup on page unload
 window.addEventListener('beforeunload', cleanupPlayers);
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') flushSeenSync();
+});
 
 // --- GLOBAL EXPOSURE ---
 window.loadFeed = loadFeed;
@@ -0,0 +1,221 @@
+# ===================================================
+# FILE: seen.py
+# SERVER-SIDE "SEEN VIDEOS" BITMAPS FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import time
+import zlib
+import base64
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from shared import logger
+from repository import repo
+
+# Users whose bitmaps are kept in memory (least recently used are evicted)
+SEEN_CACHE_SIZE = int(os.environ.get("SEEN_CACHE_SIZE", 2000))
+# Changed bitmaps are written back to Supabase in one batch this often
+SEEN_FLUSH_SECONDS = float(os.environ.get("SEEN_FLUSH_SECONDS", 30))
+SEEN_TABLE = "user_seen"
+# After a failed load, the user is served from memory this long before retrying
+SEEN_LOAD_RETRY_SECONDS = float(os.environ.get("SEEN_LOAD_RETRY_SECONDS", 30))
+# Highest video id a bitmap can hold (2**24 bits = 2 MiB per user); larger ids are ignored
+SEEN_MAX_ORDINAL = int(os.environ.get("SEEN_MAX_ORDINAL", 2 ** 24 - 1))
+
+class SeenBitmap:
+    """One bit per video ordinal (the numeric video id), packed 8 per byte"""
+
+    __slots__ = ("bits", "version")
+
+    def __init__(self, bits: Optional[np.ndarray] = None):
+        self.bits = bits if bits is not None else np.zeros(0, dtype=np.uint8)
+        self.version = 0
+
+    def add(self, ordinals: Iterable[int]) -> bool:
+        """Set the bits for these ordinals; returns True if anything changed
+
+        Ordinals outside 0..SEEN_MAX_ORDINAL are skipped, so a bogus id can't
+        blow the bitmap up.
+        """
+        ords = np.fromiter((o for o in ordinals if isinstance(o, int) and 0 <= o <= SEEN_MAX_ORDINAL),
+                           dtype=np.int64)
+        if not len(ords):
+            return False
+        needed = int(ords.max() >> 3) + 1
+        if needed > len(self.bits):
+            # Grow with headroom so new videos don't resize every time
+            grown = np.zeros(max(needed, len(self.bits) * 2), dtype=np.uint8)
+            grown[:len(self.bits)] = self.bits
+            self.bits = grown
+        before = self.bits[ords >> 3].copy()
+        np.bitwise_or.at(self.bits, ords >> 3, (1 << (ords & 7)).astype(np.uint8))
+        changed = bool((self.bits[ords >> 3] != before).any())
+        if changed:
+            self.version += 1
+        return changed
+
+    def contains(self, ordinals: np.ndarray) -> np.ndarray:
+        """Vectorized membership test; ordinals < 0 are never seen"""
+        result = np.zeros(len(ordinals), dtype=bool)
+        valid = (ordinals >= 0) & ((ordinals >> 3) < len(self.bits))
+        ords = ordinals[valid]
+        result[valid] = (self.bits[ords >> 3] >> (ords & 7).astype(np.uint8)) & 1
+        return result
+
+    def count(self) -> int:
+        return int(np.unpackbits(self.bits).sum())
+
+    def ordinals(self) -> np.ndarray:
+        """Every ordinal that is set, ascending"""
+        return np.flatnonzero(np.unpackbits(self.bits, bitorder="little"))
+
+    def serialize(self) -> str:
+        """Compact text form: base64(zlib(bits)), trailing zero bytes dropped"""
+        used = np.flatnonzero(self.bits)
+        raw = self.bits[:used[-1] + 1].tobytes() if len(used) else b""
+        return base64.b64encode(zlib.compress(raw, 9)).decode()
+
+    @classmethod
+    def deserialize(cls, data: Optional[str]) -> "SeenBitmap":
+        if not data:
+            return cls()
+        raw = zlib.decompress(base64.b64decode(data))
+        bitmap = cls(np.frombuffer(raw, dtype=np.uint8).copy())
+        # Start from a content checksum so versions stay distinct across restarts
+        bitmap.version = zlib.crc32(raw)
+        return bitmap
+
+class SeenStore:
+    """Per-user seen bitmaps: LRU in memory, write-behind to Supabase
+
+    When a user's bitmap can't be loaded, they get a provisional bitmap for
+    retry_seconds instead of a Supabase round trip per request. It collects
+    their marks but is never written back on its own, so it can't overwrite
+    the stored history; the next successful load merges it in.
+    """
+
+    def __init__(self, max_users: int = SEEN_CACHE_SIZE, retry_seconds: float = SEEN_LOAD_RETRY_SECONDS):
+        self.max_users = max_users
+        self.retry_seconds = retry_seconds
+        self._bitmaps: "OrderedDict[int, SeenBitmap]" = OrderedDict()
+        self._dirty: Dict[int, SeenBitmap] = {}
+        self._loading: Dict[int, asyncio.Task] = {}
+        # telegram_id -> (monotonic time of the failed load, provisional bitmap)
+        self._failed: "OrderedDict[int, Tuple[float, SeenBitmap]]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.loads = 0
+        self.load_errors = 0
+        self.failed_hits = 0
+        self.flushes = 0
+        self.marked = 0
+
+    async def _load(self, telegram_id: int) -> SeenBitmap:
+        self.loads += 1
+        rows = await repo.select(SEEN_TABLE, columns="bitmap",
+                                 filters={"telegram_id": telegram_id}, limit=1)
+        return SeenBitmap.deserialize(rows[0].get("bitmap") if rows else None)
+
+    async def get(self, telegram_id: int) -> SeenBitmap:
+        bitmap = self._bitmaps.get(telegram_id) or self._dirty.get(telegram_id)
+        if bitmap is None:
+            failed = self._failed.get(telegram_id)
+            if failed is not None and time.monotonic() - failed[0] < self.retry_seconds:
+                self.failed_hits += 1
+                return failed[1]
+
+            # One load per user even if several requests miss at once
+            task = self._loading.get(telegram_id)
+            if task is None:
+                task = asyncio.ensure_future(self._load(telegram_id))
+                self._loading[telegram_id] = task
+            try:
+                bitmap = await task
+            except Exception as e:
+                self.load_errors += 1
+                logger.error(f"❌ Could not load seen bitmap for {telegram_id}: {e}")
+                # Concurrent waiters on this load share one provisional bitmap
+                failed = self._failed.get(telegram_id)
+                provisional = failed[1] if failed is not None else SeenBitmap()
+                self._failed[telegram_id] = (time.monotonic(), provisional)
+                self._failed.move_to_end(telegram_id)
+                while len(self._failed) > self.max_users:
+                    self._failed.popitem(last=False)
+                return provisional
+            finally:
+                self._loading.pop(telegram_id, None)
+
+            failed = self._failed.pop(telegram_id, None)
+            if failed is not None and bitmap.add(failed[1].ordinals().tolist()):
+                # Marks made while the load was failing
+                self._dirty[telegram_id] = bitmap
+
+        self._bitmaps[telegram_id] = bitmap
+        self._bitmaps.move_to_end(telegram_id)
+        while len(self._bitmaps) > self.max_users:
+            # Unsaved bitmaps stay reachable through _dirty until flushed
+            self._bitmaps.popitem(last=False)
+        return bitmap
+
+    async def mark(self, telegram_id: int, video_ids: Iterable[int]):
+        bitmap = await self.get(telegram_id)
+        if bitmap.add(video_ids) and self._bitmaps.get(telegram_id) is bitmap:
+            self._dirty[telegram_id] = bitmap
+            self.marked += 1
+
+    async def flush(self):
+        """Write every changed bitmap in one multi-row upsert"""
+        if not self._dirty or not repo:
+            return
+        dirty, self._dirty = self._dirty, {}
+        now = datetime.utcnow().isoformat()
+        rows = [{"telegram_id": tid, "bitmap": bm.serialize(), "updated_at": now} for tid, bm in dirty.items()]
+        try:
+            await repo.upsert(SEEN_TABLE, rows, on_conflict="telegram_id")
+            self.flushes += 1
+        except Exception as e:
+            logger.error(f"❌ Seen bitmap flush failed: {e}")
+            # Retry next time, keeping anything marked meanwhile
+            for tid, bm in dirty.items():
+                self._dirty.setdefault(tid, bm)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(SEEN_FLUSH_SECONDS)
+            await self.flush()
+
+    def start(self):
+        if self._task is None and repo:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "users_cached": len(self._bitmaps),
+            "dirty": len(self._dirty),
+            "bytes": sum(len(bm.bits) for bm in self._bitmaps.values()),
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "failed_users": len(self._failed),
+            "failed_hits": self.failed_hits,
+            "flushes": self.flushes,
+            "marked": self.marked
+        }
+
+# Global store shared by the feed endpoints
+seen_store = SeenStore()
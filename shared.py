@@ -6,11 +6,10 @@
 import os
 import sys
 import logging
-from typing import Optional
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from supabase import create_client, Client  # <-- FIXED IMPORT
+
+from fsm_storage import create_storage
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +24,9 @@ PROVIDER_TOKEN = os.environ.get("PROVIDER_TOKEN", "")
 ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
 WEBHOOK_SECRET_TOKEN = os.environ.get("WEBHOOK_SECRET_TOKEN", "YOUR_WEBHOOK_SECRET")
 WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+REDIS_URL = os.environ.get("REDIS_URL", "")
+# FSM storage backend: "sqlite" (default), "redis" or "memory"
+FSM_STORAGE = os.environ.get("FSM_STORAGE", "redis" if REDIS_URL else "sqlite").lower()
 
 # Configure logging
 logging.basicConfig(
@@ -35,17 +37,9 @@ logger = logging.getLogger("yitio_bot")
 
 # Initialize Bot and Dispatcher
 bot = Bot(token=BOT_TOKEN) if BOT_TOKEN else None
-dp = Dispatcher(storage=MemoryStorage()) if BOT_TOKEN else None
-
-# Initialize Supabase if credentials exist
-supabase: Optional[Client] = None
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)  # <-- Now this will work
-        logger.info("✅ Supabase connected successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to connect to Supabase: {e}")
-        supabase = None
+dp = Dispatcher(storage=create_storage(FSM_STORAGE, REDIS_URL)) if BOT_TOKEN else None
+
+# Supabase is accessed through the async repository (see repository.py)
 
 # Global pinger instance
 _pinger = None
@@ -0,0 +1,58 @@
+# ===================================================
+# FILE: singleflight.py
+# REQUEST COALESCING FOR Y.I.T.I.O BOT
+# ===================================================
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from metrics import singleflight_calls
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-flight call
+
+    The first caller starts the call as a task; callers arriving before it
+    finishes await the same task. Nothing is kept afterwards, so a failure
+    reaches every waiter of that flight but the next call tries again.
+    Callers get the same result object and must not mutate it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+
+        # Counters
+        self.calls = 0
+        self.collapsed = 0
+
+    def _landed(self, key: Hashable, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Waiters may all have gone away; don't let the error go unretrieved
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._flights.get(key)
+        if task is None:
+            self.calls += 1
+            singleflight_calls.inc(self.name, "leader")
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda t: self._landed(key, t))
+        else:
+            self.collapsed += 1
+            singleflight_calls.inc(self.name, "collapsed")
+        # A cancelled caller must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        total = self.calls + self.collapsed
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "collapse_rate": round(self.collapsed / total, 3) if total else 0
+        }
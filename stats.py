@@ -0,0 +1,143 @@
+# ===================================================
+# FILE: stats.py
+# INCREMENTAL ADMIN STATISTICS FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional
+
+from shared import logger
+from repository import repo
+from replica import read_replica
+from utils import PLATFORMS
+
+# How often counters are re-checked against the database
+STATS_RECONCILE_SECONDS = float(os.environ.get("STATS_RECONCILE_SECONDS", 600))
+# How long a built /api/admin/stats response is reused
+STATS_CACHE_SECONDS = float(os.environ.get("STATS_CACHE_SECONDS", 5))
+
+class StatsAggregator:
+    """Admin dashboard counters kept up to date by our own writes
+
+    Inserts/payments bump the counters directly; a periodic reconcile
+    reloads them from the database to correct any drift.
+    """
+
+    def __init__(self):
+        self.videos: Dict[str, int] = {p: 0 for p in PLATFORMS}
+        self.users_total = 0
+        self.users_premium = 0
+        self.revenue: Dict[str, int] = {}
+        self.reconciled_at: Optional[datetime] = None
+
+        self._writes = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._response: Optional[dict] = None
+        self._response_at = 0.0
+
+    # ==================== WRITES ====================
+
+    def record_video(self, platform: str):
+        self.videos[platform] = self.videos.get(platform, 0) + 1
+        self._changed()
+
+    def record_payment(self, amount: int, currency: str, new_user: bool, newly_premium: bool):
+        self.revenue[currency] = self.revenue.get(currency, 0) + (amount or 0)
+        if new_user:
+            self.users_total += 1
+        if newly_premium:
+            self.users_premium += 1
+        self._changed()
+
+    def record_expired(self, count: int):
+        self.users_premium = max(0, self.users_premium - count)
+        self._changed()
+
+    def _changed(self):
+        self._writes += 1
+        self._response = None
+
+    # ==================== RECONCILE ====================
+
+    async def reconcile(self):
+        """Reload every counter from the database (queries run concurrently)
+
+        Counts come from the local replica while it is fresh; revenue always
+        comes from Supabase (payments are not replicated).
+        """
+        async with self._lock:
+            writes_before = self._writes
+            *video_counts, users_total, users_premium, revenue = await asyncio.gather(
+                *(read_replica.count_videos(p) for p in PLATFORMS),
+                read_replica.count_users(),
+                read_replica.count_users(premium_only=True),
+                repo.revenue_by_currency()
+            )
+
+            # Our own writes raced the queries; keep the incremental values this round
+            if self._writes != writes_before:
+                logger.info("📊 Stats changed during reconcile, keeping incremental counters")
+                return
+
+            self.videos = dict(zip(PLATFORMS, video_counts))
+            self.users_total = users_total
+            self.users_premium = users_premium
+            self.revenue = revenue
+            self.reconciled_at = datetime.utcnow()
+            self._response = None
+
+    async def _reconcile_loop(self):
+        while True:
+            await asyncio.sleep(STATS_RECONCILE_SECONDS)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"❌ Stats reconcile failed: {e}")
+
+    def start(self):
+        if self._task is None and repo:
+            self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ==================== READ ====================
+
+    async def snapshot(self) -> dict:
+        """Dashboard payload, cached for STATS_CACHE_SECONDS"""
+        if self.reconciled_at is None:
+            await self.reconcile()
+
+        if self._response is not None and time.monotonic() - self._response_at < STATS_CACHE_SECONDS:
+            return self._response
+
+        videos_total = sum(self.videos.values())
+        self._response = {
+            "videos": {
+                **{p.lower(): self.videos.get(p, 0) for p in PLATFORMS},
+                "total": videos_total
+            },
+            "users": {
+                "total": self.users_total,
+                "premium": self.users_premium,
+                "premium_percentage": (self.users_premium / self.users_total * 100) if self.users_total > 0 else 0
+            },
+            "revenue": sum(self.revenue.values()),
+            "revenue_by_currency": dict(self.revenue),
+            "reconciled_at": self.reconciled_at.isoformat() if self.reconciled_at else None
+        }
+        self._response_at = time.monotonic()
+        return self._response
+
+# Global aggregator
+stats_aggregator = StatsAggregator()
@@ -0,0 +1,176 @@
+# ===================================================
+# FILE: telegram_auth.py
+# VERIFIED TELEGRAM WEBAPP initData FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import hmac
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import parse_qsl
+
+from shared import logger, BOT_TOKEN
+
+# initData older than this (by its auth_date) is rejected
+INIT_DATA_MAX_AGE_SECONDS = int(os.environ.get("INIT_DATA_MAX_AGE_SECONDS", 86400))
+# Verified initData strings remembered, keyed by their hash field
+INIT_DATA_CACHE_SIZE = int(os.environ.get("INIT_DATA_CACHE_SIZE", 10000))
+# Lifetime of the tokens that stand in for initData in stream URLs
+STREAM_TOKEN_TTL_SECONDS = int(os.environ.get("STREAM_TOKEN_TTL_SECONDS", 60))
+
+class InitData:
+    """The fields of a verified initData string we use"""
+
+    __slots__ = ("user", "auth_date", "hash")
+
+    def __init__(self, user: dict, auth_date: int, hash: str):
+        self.user = user
+        self.auth_date = auth_date
+        self.hash = hash
+
+    @property
+    def user_id(self) -> Optional[int]:
+        return self.user.get("id")
+
+def _hash_field(init_data: str) -> str:
+    """The hash=... value, found without parsing the whole query string"""
+    for part in init_data.split("&"):
+        if part.startswith("hash="):
+            return part[5:]
+    return ""
+
+class InitDataVerifier:
+    """Checks the initData signature once per session, then serves it from memory
+
+    Telegram signs initData with HMAC-SHA256 using
+    HMAC-SHA256("WebAppData", bot_token) as the key; see
+    https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app
+    Cache entries are keyed by `hash` but also keep the raw string, so a hit
+    still requires the exact same bytes that were verified.
+    """
+
+    def __init__(self, bot_token: str = BOT_TOKEN, max_age: int = INIT_DATA_MAX_AGE_SECONDS,
+                 max_size: int = INIT_DATA_CACHE_SIZE):
+        self._secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest() if bot_token else None
+        self.max_age = max_age
+        self.max_size = max_size
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+        # Counters
+        self.hits = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def _fresh(self, data: InitData) -> bool:
+        return not self.max_age or time.time() - data.auth_date <= self.max_age
+
+    def _parse(self, init_data: str) -> Optional[InitData]:
+        fields = dict(parse_qsl(init_data, keep_blank_values=True))
+        received = fields.pop("hash", "")
+        check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+        expected = hmac.new(self._secret, check_string.encode(), hashlib.sha256).hexdigest()
+        if not received or not hmac.compare_digest(expected, received):
+            return None
+        user = json.loads(fields.get("user") or "{}")
+        return InitData(user if isinstance(user, dict) else {}, int(fields.get("auth_date") or 0), received)
+
+    def verify(self, init_data: Optional[str]) -> Optional[InitData]:
+        """Verified initData, or None if it is missing, forged or expired"""
+        if not init_data or self._secret is None:
+            return None
+
+        hash_value = _hash_field(init_data)
+        entry = self._cache.get(hash_value)
+        if entry is not None and entry[0] == init_data:
+            data = entry[1]
+            if self._fresh(data):
+                self.hits += 1
+                self._cache.move_to_end(hash_value)
+                return data
+            del self._cache[hash_value]
+            self.rejected += 1
+            return None
+
+        try:
+            data = self._parse(init_data)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"⚠️ Malformed initData: {e}")
+            data = None
+        if data is None or not self._fresh(data):
+            self.rejected += 1
+            return None
+
+        self.verified += 1
+        self._cache[data.hash] = (init_data, data)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "verified": self.verified,
+            "rejected": self.rejected
+        }
+
+class StreamTokens:
+    """Short-lived user tokens for URLs, where initData must not go
+
+    EventSource can't send headers, and access logs record query strings,
+    so the mini-app trades its initData (sent in a header) for a token and
+    puts that in the stream URL instead. A token is
+    "<user_id>.<expires>.<signature>", HMAC-signed with a key derived from
+    the bot token, so any worker can check it without shared state.
+    """
+
+    def __init__(self, bot_token: str = BOT_TOKEN, ttl: int = STREAM_TOKEN_TTL_SECONDS):
+        self._secret = hmac.new(b"StreamToken", bot_token.encode(), hashlib.sha256).digest() if bot_token else None
+        self.ttl = ttl
+
+        # Counters
+        self.issued = 0
+        self.rejected = 0
+
+    def _sign(self, payload: str) -> str:
+        return hmac.new(self._secret, payload.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def issue(self, user_id: int) -> str:
+        if self._secret is None:
+            raise RuntimeError("Stream tokens need BOT_TOKEN")
+        payload = f"{user_id}.{int(time.time()) + self.ttl}"
+        self.issued += 1
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token: Optional[str]) -> Optional[int]:
+        """User id of a valid, unexpired token, else None"""
+        if not token or self._secret is None:
+            return None
+        payload, _, signature = token.rpartition(".")
+        user_id, _, expires = payload.partition(".")
+        if not hmac.compare_digest(self._sign(payload), signature):
+            self.rejected += 1
+            return None
+        try:
+            if int(expires) < time.time():
+                self.rejected += 1
+                return None
+            return int(user_id)
+        except ValueError:
+            self.rejected += 1
+            return None
+
+    def stats(self) -> dict:
+        return {
+            "ttl": self.ttl,
+            "issued": self.issued,
+            "rejected": self.rejected
+        }
+
+# Global verifier used by the mini-app API
+init_data_verifier = InitDataVerifier()
+# Global stream token issuer/checker
+stream_tokens = StreamTokens()
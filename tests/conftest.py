@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The app modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read at import time: a bot (so handlers register), a known
+# admin and nothing persisted outside the test run
+os.environ.setdefault("BOT_TOKEN", "123456:TEST-token-for-the-test-suite-only")
+os.environ.setdefault("ADMIN_ID", "1")
+os.environ.setdefault("FSM_STORAGE", "memory")
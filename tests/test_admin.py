@@ -0,0 +1,89 @@
+# ===================================================
+# FILE: tests/test_admin.py
+# ADMIN-ONLY BOT HANDLERS
+# ===================================================
+
+import asyncio
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Update
+
+from shared import dp, ADMIN_ID
+from admin import AdminUpload
+
+OTHER_USER_ID = ADMIN_ID + 1000
+
+class RecordingSession(BaseSession):
+    """Bot API session that records method calls instead of sending them"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(type(method).__name__)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": "Test"}
+
+def _callback(update_id: int, user_id: int, data: str) -> Update:
+    return Update(update_id=update_id, callback_query={
+        "id": str(update_id), "from": _user(user_id), "chat_instance": "1", "data": data,
+        "message": {"message_id": 1, "date": datetime.now(), "chat": {"id": user_id, "type": "private"},
+                    "text": "<b>Admin Control Panel</b>"}
+    })
+
+def _message(update_id: int, user_id: int, text: str) -> Update:
+    return Update(update_id=update_id, message={
+        "message_id": update_id, "date": datetime.now(), "text": text,
+        "chat": {"id": user_id, "type": "private"}, "from": _user(user_id)
+    })
+
+def _run(scenario):
+    async def wrapped():
+        session = RecordingSession()
+        bot = Bot(token="123456:TEST-token-for-the-test-suite-only", session=session)
+        return await scenario(bot, session)
+    return asyncio.run(wrapped())
+
+def test_bulk_import_callback_is_admin_only():
+    async def scenario(bot, session):
+        await dp.feed_update(bot, _callback(1, OTHER_USER_ID, "bulk_import"))
+        other_state = await dp.fsm.get_context(bot, OTHER_USER_ID, OTHER_USER_ID).get_state()
+        ignored_calls = list(session.calls)
+
+        await dp.feed_update(bot, _callback(2, ADMIN_ID, "bulk_import"))
+        admin_state = await dp.fsm.get_context(bot, ADMIN_ID, ADMIN_ID).get_state()
+        await dp.fsm.get_context(bot, ADMIN_ID, ADMIN_ID).clear()
+        return other_state, ignored_calls, admin_state
+
+    other_state, ignored_calls, admin_state = _run(scenario)
+
+    assert other_state is None
+    assert ignored_calls == []
+    # The same callback from the admin does start the import
+    assert admin_state == AdminUpload.waiting_import.state
+
+def test_bulk_import_upload_is_admin_only():
+    async def scenario(bot, session):
+        # Even in the import state, a non-admin's upload is not handled
+        context = dp.fsm.get_context(bot, OTHER_USER_ID, OTHER_USER_ID)
+        await context.set_state(AdminUpload.waiting_import)
+        await dp.feed_update(bot, _message(3, OTHER_USER_ID, "https://youtu.be/dQw4w9WgXcQ"))
+        state = await context.get_state()
+        await context.clear()
+        return state, list(session.calls)
+
+    state, calls = _run(scenario)
+
+    assert calls == []
+    assert state == AdminUpload.waiting_import.state
@@ -0,0 +1,206 @@
+# ===================================================
+# FILE: tests/test_feed.py
+# RANKED FEED PAGING
+# ===================================================
+
+import base64
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from catalog import VideoCatalog, sort_key, encode_cursor
+from ranking import RankedFeed, RecencyStrategy, RecencyViewsStrategy
+from replica import read_replica
+from seen import SeenBitmap
+
+VIDEOS = 230
+LIMIT = 7
+
+def make_rows(count: int, start_id: int = 1, start: datetime = datetime(2024, 1, 1)) -> list:
+    """Videos with plenty of score ties: created_at and views repeat in runs"""
+    rng = random.Random(start_id)
+    rows = [{
+        "id": i,
+        "url": f"https://youtube.com/shorts/v{i:010d}",
+        "platform": "YouTube",
+        "views": rng.choice([0, 0, 10, 500]),
+        "created_at": (start + timedelta(hours=(i - start_id) // 5)).isoformat()
+    } for i in range(start_id, start_id + count)]
+    rows.sort(key=sort_key, reverse=True)
+    return rows
+
+def walk(feed: RankedFeed, bucket: int, limit: int = LIMIT, exclude=None, after=None):
+    """Every page from `after` to the end of the feed"""
+    pages = []
+    while True:
+        page, after = feed.page(bucket, after, limit, exclude)
+        pages.append([r["id"] for r in page])
+        if after is None:
+            return pages
+        assert len(pages) <= VIDEOS, "paging does not terminate"
+
+def test_pages_cover_the_feed_exactly_once():
+    rows = make_rows(VIDEOS)
+    for strategy in (RecencyStrategy(), RecencyViewsStrategy()):
+        feed = RankedFeed(rows, strategy, buckets=4)
+        for bucket in range(4):
+            pages = walk(feed, bucket)
+            ids = [i for page in pages for i in page]
+            assert len(ids) == len(set(ids)), f"{strategy.name}/{bucket}: repeated ids"
+            assert set(ids) == {r["id"] for r in rows}, f"{strategy.name}/{bucket}: skipped ids"
+            # Same order as one big page
+            assert ids == [r["id"] for r in feed.page(bucket, None, VIDEOS)[0]]
+            assert all(len(page) == LIMIT for page in pages[:-1])
+
+def test_all_ties_are_paged_by_id():
+    # One score for everything: the cursor's id alone must carry the position
+    rows = [{"id": i, "created_at": "2024-01-01T00:00:00", "views": 0} for i in range(50, 0, -1)]
+    pages = walk(RankedFeed(rows, RecencyStrategy()), 0, limit=4)
+    ids = [i for page in pages for i in page]
+    assert ids == [r["id"] for r in rows]
+
+def test_cursor_survives_catalog_reload(monkeypatch):
+    old = make_rows(VIDEOS)
+    # Much newer videos, ranked ahead of any cursor into the old feed
+    new = make_rows(20, start_id=VIDEOS + 1, start=datetime(2024, 6, 1))
+    current = {"rows": old}
+
+    async def list_videos():
+        # A reload hands back fresh row objects, in whatever order the source has
+        rows = [dict(r) for r in current["rows"]]
+        random.Random(7).shuffle(rows)
+        return rows
+
+    monkeypatch.setattr(read_replica, "list_videos", list_videos)
+
+    async def scenario():
+        catalog = VideoCatalog()
+        before, after = [], None
+        for _ in range(5):
+            page, after = await catalog.get_page("All", after, LIMIT, bucket=3)
+            before += [r["id"] for r in page]
+
+        current["rows"] = old + new
+        catalog.invalidate()
+        rest = []
+        while after is not None:
+            page, after = await catalog.get_page("All", after, LIMIT, bucket=3)
+            rest += [r["id"] for r in page]
+        return before, rest
+
+    before, rest = asyncio.run(scenario())
+
+    assert not set(before) & set(rest)
+    assert len(rest) == len(set(rest))
+    # Exactly the old videos not served yet; the new ones rank above the cursor
+    assert set(before) | set(rest) == {r["id"] for r in old}
+
+def test_seen_videos_are_excluded_without_short_pages():
+    rows = make_rows(VIDEOS)
+    feed = RankedFeed(rows, RecencyViewsStrategy(), buckets=4)
+    order = [r["id"] for r in feed.page(2, None, VIDEOS)[0]]
+
+    seen = SeenBitmap()
+    rng = random.Random(3)
+    # A long seen run (several scan chunks) at the top, then scattered ones
+    seen_ids = set(order[:60]) | {i for i in order[60:] if rng.random() < 0.5}
+    seen.add(seen_ids)
+
+    pages = walk(feed, 2, exclude=seen)
+    ids = [i for page in pages for i in page]
+
+    assert not set(ids) & seen_ids
+    assert len(ids) == len(set(ids))
+    assert ids == [i for i in order if i not in seen_ids]
+    # Only the last page may come up short (or empty, when only seen rows were left)
+    assert all(len(page) == LIMIT for page in pages[:-1])
+
+def test_everything_seen_gives_an_empty_last_page():
+    rows = make_rows(30)
+    seen = SeenBitmap()
+    seen.add(r["id"] for r in rows)
+    page, after = RankedFeed(rows, RecencyStrategy()).page(0, None, LIMIT, exclude=seen)
+    assert page == [] and after is None
+
+def test_ordinals_only_for_numeric_ids():
+    rows = [{"id": 5, "created_at": "2024-01-02"}, {"id": "legacy", "created_at": "2024-01-01"}]
+    feed = RankedFeed(rows, RecencyStrategy())
+    assert feed.ordinals.tolist() == [5, -1]
+    seen = SeenBitmap()
+    seen.add([5])
+    assert [r["id"] for r in feed.page(0, None, 10, seen)[0]] == ["legacy"]
+
+# ==================== /api/videos ====================
+
+def _api_scenario(monkeypatch, scenario):
+    """Run scenario(client) against main.app with a fixed catalog of VIDEOS rows"""
+    import httpx
+    import main
+    import ratelimit
+    from catalog import video_catalog
+
+    rows = make_rows(VIDEOS)
+
+    async def list_videos():
+        return [dict(r) for r in rows]
+
+    monkeypatch.setattr(read_replica, "list_videos", list_videos)
+    # Any truthy repository: the catalog is all these requests read
+    monkeypatch.setattr(main, "repo", object())
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", False)
+
+    async def run():
+        video_catalog.invalidate()
+        transport = httpx.ASGITransport(app=main.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await scenario(client)
+        finally:
+            video_catalog.invalidate()
+
+    return rows, asyncio.run(run())
+
+def test_api_rejects_bad_cursors(monkeypatch):
+    bad = [
+        "not base64 !",
+        "e30",  # {}
+        base64.urlsafe_b64encode(b"[1,2,3]").decode(),
+        base64.urlsafe_b64encode(b'["high",5]').decode(),
+        base64.urlsafe_b64encode(b"[1]").decode(),
+    ]
+
+    async def scenario(client):
+        statuses = [(await client.get("/api/videos", params={"cursor": c})).status_code for c in bad]
+        good = await client.get("/api/videos", params={"cursor": encode_cursor((1.5, 3))})
+        return statuses, good.status_code
+
+    _, (statuses, good) = _api_scenario(monkeypatch, scenario)
+    assert statuses == [400] * len(bad)
+    assert good == 200
+
+def test_api_pages_to_the_end(monkeypatch):
+    async def scenario(client):
+        pages, cursor = [], ""
+        while cursor is not None:
+            response = await client.get("/api/videos", params={"cursor": cursor, "limit": 40})
+            assert response.status_code == 200
+            body = response.json()
+            pages.append([v["id"] for v in body["videos"]])
+            cursor = body["next_cursor"]
+            assert len(pages) <= VIDEOS
+        return pages
+
+    rows, pages = _api_scenario(monkeypatch, scenario)
+    ids = [i for page in pages for i in page]
+    assert len(ids) == len(set(ids)) == len(rows)
+    assert all(len(page) == 40 for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= 40
+
+def test_api_cursor_past_the_end(monkeypatch):
+    async def scenario(client):
+        response = await client.get("/api/videos", params={"cursor": encode_cursor((-1e18, 0))})
+        return response.status_code, response.json()
+
+    _, (status, body) = _api_scenario(monkeypatch, scenario)
+    assert status == 200
+    assert body == {"videos": [], "next_cursor": None}
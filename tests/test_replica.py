@@ -0,0 +1,67 @@
+# ===================================================
+# FILE: tests/test_replica.py
+# LOCAL SQLITE READ REPLICA
+# ===================================================
+
+import asyncio
+
+from replica import ReadReplica, _put_users
+
+def _users(replica: ReadReplica) -> dict:
+    rows = replica._db.execute(
+        "SELECT telegram_id, is_premium, premium_expires_at, updated_at FROM users ORDER BY telegram_id"
+    ).fetchall()
+    return {r[0]: r[1:] for r in rows}
+
+def test_put_users_only_touches_present_columns(tmp_path):
+    replica = ReadReplica(str(tmp_path / "replica.sqlite3"))
+    replica.open()
+    try:
+        _put_users(replica._db, [
+            {"telegram_id": 1, "is_premium": True, "premium_expires_at": "2030-01-01", "updated_at": "a"},
+            {"telegram_id": 2, "is_premium": "false", "premium_expires_at": None, "updated_at": "a"},
+        ])
+        # Partial rows, mixed in one batch: missing columns keep their values
+        _put_users(replica._db, [
+            {"telegram_id": 1, "updated_at": "b"},
+            {"telegram_id": 2, "is_premium": "true"},
+            {"telegram_id": 3},
+            {"is_premium": True},
+        ])
+        assert _users(replica) == {
+            1: (1, "2030-01-01", "b"),
+            2: (1, None, "a"),
+            3: (None, None, None),
+        }
+    finally:
+        replica.close()
+
+def test_full_reload_replaces_the_table_off_the_loop(tmp_path):
+    replica = ReadReplica(str(tmp_path / "replica.sqlite3"))
+    replica.open()
+    try:
+        _put_users(replica._db, [{"telegram_id": 10 ** 9, "is_premium": True}])
+        rows = [{"telegram_id": i, "is_premium": i % 2 == 0, "premium_expires_at": None, "updated_at": "x"}
+                for i in range(1, 20001)]
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0)
+
+            task = asyncio.create_task(ticker())
+            await asyncio.to_thread(replica._replace_table, "users", _put_users, rows)
+            task.cancel()
+            return ticks
+
+        # The loop kept running while the table was rewritten
+        assert asyncio.run(scenario()) > 1
+        users = _users(replica)
+        assert len(users) == 20000 and 10 ** 9 not in users
+        assert users[2] == (1, None, "x")
+    finally:
+        replica.close()
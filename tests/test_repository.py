@@ -0,0 +1,52 @@
+# ===================================================
+# FILE: tests/test_repository.py
+# CONCURRENCY OF THE ASYNC SUPABASE REPOSITORY
+# ===================================================
+
+import time
+import asyncio
+
+from aiohttp import web
+
+from http_clients import http_clients
+from repository import SupabaseRepository
+
+LATENCY_SECONDS = 0.2
+CONCURRENT_CALLS = 10
+
+async def _start_stub_postgrest(latency: float):
+    """Minimal PostgREST stand-in: every GET sleeps `latency`, then echoes one row"""
+    async def handle(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        return web.json_response([{"table": request.match_info["table"], **request.query}])
+
+    app = web.Application()
+    app.router.add_get("/rest/v1/{table}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+def test_concurrent_selects_overlap():
+    async def scenario():
+        runner, base_url = await _start_stub_postgrest(LATENCY_SECONDS)
+        try:
+            repo = SupabaseRepository(base_url, "test-key")
+            started = time.perf_counter()
+            # Distinct filters, so request coalescing can't merge the calls
+            results = await asyncio.gather(*(
+                repo.select("users", filters={"telegram_id": i}) for i in range(CONCURRENT_CALLS)
+            ))
+            elapsed = time.perf_counter() - started
+        finally:
+            await http_clients.close()
+            await runner.cleanup()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(scenario())
+
+    assert [r[0]["telegram_id"] for r in results] == [f"eq.{i}" for i in range(CONCURRENT_CALLS)]
+    # Serialized calls would take CONCURRENT_CALLS * LATENCY_SECONDS (2 s)
+    assert elapsed < LATENCY_SECONDS * 3, f"{CONCURRENT_CALLS} selects took {elapsed:.2f}s"
@@ -0,0 +1,98 @@
+# ===================================================
+# FILE: tests/test_seen.py
+# SEEN BITMAPS AND THEIR STORE
+# ===================================================
+
+import asyncio
+
+import numpy as np
+
+import seen
+from seen import SeenBitmap, SeenStore, SEEN_MAX_ORDINAL
+
+def test_bitmap_add_and_contains():
+    bitmap = SeenBitmap()
+    assert bitmap.add([0, 7, 8, 1000])
+    assert not bitmap.add([7])  # already set
+    probe = np.array([0, 1, 7, 8, 9, 999, 1000, 1001], dtype=np.int64)
+    assert bitmap.contains(probe).tolist() == [True, False, True, True, False, False, True, False]
+    assert bitmap.ordinals().tolist() == [0, 7, 8, 1000]
+    assert bitmap.count() == 4
+
+def test_bitmap_add_ignores_out_of_range_ordinals():
+    bitmap = SeenBitmap()
+    assert not bitmap.add([-1, SEEN_MAX_ORDINAL + 1, 2 ** 63 - 1, "5", 5.0, None])
+    assert len(bitmap.bits) == 0
+    # The largest allowed ordinal fits, and sizes the bitmap to exactly that
+    assert bitmap.add([SEEN_MAX_ORDINAL])
+    assert len(bitmap.bits) == (SEEN_MAX_ORDINAL >> 3) + 1
+
+def test_bitmap_contains_outside_the_bitmap():
+    bitmap = SeenBitmap()
+    bitmap.add([3])
+    probe = np.array([-1, -8, 3, 8 * len(bitmap.bits), 2 ** 62], dtype=np.int64)
+    assert bitmap.contains(probe).tolist() == [False, False, True, False, False]
+    assert SeenBitmap().contains(probe).tolist() == [False] * len(probe)
+
+def test_bitmap_round_trip():
+    bitmap = SeenBitmap()
+    bitmap.add([1, 64, 4095])
+    copy = SeenBitmap.deserialize(bitmap.serialize())
+    assert copy.ordinals().tolist() == [1, 64, 4095]
+
+class FlakyRepo:
+    """user_seen table that fails until `broken` is cleared"""
+
+    def __init__(self):
+        self.broken = True
+        self.selects = 0
+        self.stored = SeenBitmap()
+        self.stored.add([1, 2])
+
+    async def select(self, table, **kwargs):
+        self.selects += 1
+        await asyncio.sleep(0)
+        if self.broken:
+            raise RuntimeError('relation "user_seen" does not exist')
+        return [{"bitmap": self.stored.serialize()}]
+
+def test_failed_load_is_cached_and_marks_survive(monkeypatch):
+    fake = FlakyRepo()
+    monkeypatch.setattr(seen, "repo", fake)
+
+    async def scenario():
+        store = SeenStore(retry_seconds=60)
+        # Concurrent misses share one failing load
+        first, second = await asyncio.gather(store.get(42), store.get(42))
+        assert first is second
+        # Within the retry window nothing goes to Supabase
+        for _ in range(5):
+            await store.get(42)
+        await store.mark(42, [5])
+        assert fake.selects == 1
+        assert store.stats()["failed_hits"] >= 5
+        # The mark is honoured right away, but not queued over the stored history
+        assert (await store.get(42)).contains(np.array([5])).tolist() == [True]
+        assert store.stats()["dirty"] == 0
+
+        # Once the table works again the stored bitmap is loaded and the mark merged in
+        fake.broken = False
+        store.retry_seconds = 0
+        bitmap = await store.get(42)
+        assert fake.selects == 2
+        assert bitmap.ordinals().tolist() == [1, 2, 5]
+        assert store.stats()["dirty"] == 1
+        assert store.stats()["failed_users"] == 0
+
+    asyncio.run(scenario())
+
+def test_failed_loads_are_bounded(monkeypatch):
+    monkeypatch.setattr(seen, "repo", FlakyRepo())
+
+    async def scenario():
+        store = SeenStore(max_users=3)
+        for user_id in range(10):
+            await store.get(user_id)
+        assert store.stats()["failed_users"] == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,120 @@
+# ===================================================
+# FILE: tests/test_telegram_auth.py
+# TELEGRAM WEBAPP initData VERIFICATION
+# ===================================================
+
+import hmac
+import json
+import time
+import hashlib
+from urllib.parse import urlencode
+
+from shared import BOT_TOKEN
+from telegram_auth import InitDataVerifier, StreamTokens, init_data_verifier
+from utils import get_user_id_from_init_data
+
+USER_ID = 4242
+
+def sign(fields: dict, bot_token: str = BOT_TOKEN) -> str:
+    """initData as Telegram builds it: fields plus an HMAC of their sorted check string"""
+    secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    signature = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode({**fields, "hash": signature})
+
+def session(user_id: int = USER_ID, auth_date: int = None, **extra) -> str:
+    return sign({
+        "user": json.dumps({"id": user_id, "first_name": "Test"}),
+        "auth_date": str(int(time.time()) if auth_date is None else auth_date),
+        "query_id": "AAH1",
+        **extra
+    })
+
+def test_valid_signature_is_accepted():
+    verifier = InitDataVerifier()
+    data = verifier.verify(session())
+    assert data is not None and data.user_id == USER_ID
+    assert get_user_id_from_init_data(session()) == USER_ID
+
+def test_tampered_hash_is_rejected():
+    init_data = session()
+    head, _, signature = init_data.rpartition("hash=")
+    forged = head + "hash=" + ("0" if signature[0] != "0" else "1") + signature[1:]
+    assert InitDataVerifier().verify(forged) is None
+
+def test_tampered_field_is_rejected():
+    init_data = session()
+    forged = init_data.replace(f"%22id%22%3A+{USER_ID}", "%22id%22%3A+1")
+    assert forged != init_data
+    assert InitDataVerifier().verify(forged) is None
+    assert get_user_id_from_init_data(forged) is None
+
+def test_other_bot_signature_is_rejected():
+    fields = {"user": json.dumps({"id": USER_ID}), "auth_date": str(int(time.time()))}
+    assert InitDataVerifier().verify(sign(fields, "999:another-bot-token")) is None
+
+def test_expired_auth_date_is_rejected():
+    verifier = InitDataVerifier(max_age=3600)
+    assert verifier.verify(session(auth_date=int(time.time()) - 7200)) is None
+    assert verifier.verify(session(auth_date=int(time.time()) - 60)) is not None
+
+def test_malformed_input_is_rejected():
+    verifier = InitDataVerifier()
+    now = str(int(time.time()))
+    for init_data in [
+        None, "", "garbage", "hash=", "&&&=%%%", "user=%7B&hash=abc",
+        # Correctly signed, but the fields themselves are unusable
+        sign({"user": "{not json", "auth_date": now}),
+        sign({"user": json.dumps({"id": USER_ID}), "auth_date": "yesterday"}),
+    ]:
+        assert verifier.verify(init_data) is None, init_data
+    assert verifier.verified == 0
+
+def test_cache_hit_requires_the_same_payload():
+    verifier = InitDataVerifier()
+    init_data = session()
+    assert verifier.verify(init_data) is not None
+    assert verifier.verify(init_data) is not None
+    assert verifier.hits == 1
+
+    # Same hash field, different user: must not be served from the cache
+    forged = init_data.replace(f"%22id%22%3A+{USER_ID}", "%22id%22%3A+1")
+    assert forged != init_data
+    assert verifier.verify(forged) is None
+    assert verifier.hits == 1
+
+def test_cache_hit_still_checks_freshness():
+    verifier = InitDataVerifier(max_age=3600)
+    init_data = session(auth_date=int(time.time()) - 3000)
+    assert verifier.verify(init_data) is not None
+    verifier.max_age = 60
+    assert verifier.verify(init_data) is None
+    assert verifier.stats()["cached"] == 0
+
+def test_cache_is_bounded():
+    verifier = InitDataVerifier(max_size=3)
+    for user_id in range(10):
+        assert verifier.verify(session(user_id=user_id + 1)) is not None
+    assert verifier.stats()["cached"] == 3
+
+def test_global_verifier_uses_the_bot_token():
+    assert init_data_verifier.verify(session()) is not None
+
+def test_stream_token_round_trip():
+    tokens = StreamTokens(ttl=60)
+    token = tokens.issue(USER_ID)
+    assert tokens.verify(token) == USER_ID
+    # Only the signature makes it valid, and it is bound to the user and expiry
+    user_id, expires, signature = token.split(".")
+    assert tokens.verify(f"{USER_ID + 1}.{expires}.{signature}") is None
+    assert tokens.verify(f"{user_id}.{int(expires) + 3600}.{signature}") is None
+    assert StreamTokens("999:another-bot-token").verify(token) is None
+
+def test_stream_token_expires():
+    tokens = StreamTokens(ttl=-1)
+    assert tokens.verify(tokens.issue(USER_ID)) is None
+
+def test_malformed_stream_token_is_rejected():
+    tokens = StreamTokens()
+    for token in [None, "", "garbage", "..", f"{USER_ID}.soon.abc"]:
+        assert tokens.verify(token) is None, token
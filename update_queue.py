@@ -0,0 +1,144 @@
+# ===================================================
+# FILE: update_queue.py
+# BACKGROUND TELEGRAM UPDATE PROCESSING FOR Y.I.T.I.O BOT
+# ===================================================
+
+import os
+import asyncio
+from typing import List
+
+from aiogram import types
+
+from shared import bot, dp, logger
+
+# "queue": ack the webhook at once and process in the background
+# "inline": process inside the webhook request (previous behaviour)
+WEBHOOK_MODE = os.environ.get("WEBHOOK_MODE", "queue").lower()
+UPDATE_WORKERS = int(os.environ.get("UPDATE_WORKERS", 4))
+UPDATE_QUEUE_SIZE = int(os.environ.get("UPDATE_QUEUE_SIZE", 1000))
+# How long the webhook may wait for room in a full queue before giving up
+UPDATE_ENQUEUE_TIMEOUT_SECONDS = float(os.environ.get("UPDATE_ENQUEUE_TIMEOUT_SECONDS", 2))
+UPDATE_DRAIN_TIMEOUT_SECONDS = float(os.environ.get("UPDATE_DRAIN_TIMEOUT_SECONDS", 20))
+
+class QueueFullError(Exception):
+    """Raised when an update cannot be queued in time"""
+
+def _chat_key(update: types.Update) -> int:
+    """Updates with the same key are processed in arrival order"""
+    if update.message:
+        return update.message.chat.id
+    if update.callback_query:
+        return update.callback_query.from_user.id
+    if update.pre_checkout_query:
+        return update.pre_checkout_query.from_user.id
+    return update.update_id
+
+class UpdateQueue:
+    """Bounded queue of Telegram updates drained by a pool of workers
+
+    Each worker owns one shard and every chat maps to a single shard, so
+    updates of a chat keep their order while different chats run in parallel.
+    The order only holds within one process: with WEB_CONCURRENCY > 1 two
+    updates of a chat can land on different workers and run concurrently.
+    """
+
+    def __init__(self, workers: int = UPDATE_WORKERS, max_size: int = UPDATE_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        shard_size = max(1, max_size // self.workers)
+        self._shards: List[asyncio.Queue] = [asyncio.Queue(maxsize=shard_size) for _ in range(self.workers)]
+        self._tasks: List[asyncio.Task] = []
+        self.accepting = False
+
+        # Counters
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        if self._tasks:
+            return
+        self.accepting = True
+        self._tasks = [asyncio.create_task(self._worker(q)) for q in self._shards]
+        logger.info(f"📥 Update queue started with {self.workers} workers")
+
+    async def put(self, update: types.Update, timeout: float = UPDATE_ENQUEUE_TIMEOUT_SECONDS):
+        """Queue an update; waits up to `timeout` for room (backpressure)"""
+        if not self.accepting:
+            self.rejected += 1
+            raise QueueFullError("Update queue is not accepting updates")
+
+        shard = self._shards[_chat_key(update) % self.workers]
+        item = (update, asyncio.get_running_loop().time())
+        try:
+            shard.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(shard.put(item), timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise QueueFullError("Update queue is full")
+        self.enqueued += 1
+
+    async def _worker(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            update, queued_at = await queue.get()
+            started_at = loop.time()
+            try:
+                await dp.feed_update(bot, update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Update {update.update_id} failed: {e}")
+            finally:
+                finished_at = loop.time()
+                self._wait_total += started_at - queued_at
+                self._run_total += finished_at - started_at
+                self.max_latency = max(self.max_latency, finished_at - queued_at)
+                queue.task_done()
+
+    async def stop(self, timeout: float = UPDATE_DRAIN_TIMEOUT_SECONDS):
+        """Stop accepting updates, finish the queued ones, then stop the workers"""
+        if not self._tasks:
+            return
+        self.accepting = False
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._shards)), timeout)
+            logger.info("✅ Update queue drained")
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Update queue not drained after {timeout}s, {self.depth()} updates dropped")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._shards)
+
+    def stats(self) -> dict:
+        done = self.processed + self.failed
+        return {
+            "mode": WEBHOOK_MODE,
+            "workers": self.workers,
+            "depth": self.depth(),
+            "shard_depths": [q.qsize() for q in self._shards],
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": (self._wait_total / done * 1000) if done else 0,
+            "avg_processing_ms": (self._run_total / done * 1000) if done else 0,
+            "max_latency_ms": self.max_latency * 1000
+        }
+
+# Global queue used by the webhook endpoints
+update_queue = UpdateQueue()
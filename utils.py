@@ -3,39 +3,83 @@
 # SHARED UTILITY FUNCTIONS FOR Y.I.T.I.O BOT
 # ===================================================
 
+import os
+import re
+import logging
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("yitio_bot")
+
+PLATFORMS = ["YouTube", "TikTok", "Instagram"]
+
+# Size of the canonicalize_url LRU cache
+CANONICAL_CACHE_SIZE = int(os.environ.get("CANONICAL_CACHE_SIZE", 4096))
+
+# Precompiled URL patterns (host matching is case-insensitive, ids are not)
+_YOUTUBE_RE = re.compile(
+    r"(?:https?://)?(?:[\w-]+\.)?(?:"
+    r"(?i:youtube\.com)/(?:shorts/|embed/|live/|v/|watch/?\?(?:[^#]*&)?v=)"
+    r"|(?i:youtu\.be)/)"
+    r"([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])"
+)
+_TIKTOK_RE = re.compile(r"(?:https?://)?(?:[\w-]+\.)?(?i:tiktok\.com)/(?:@[^/?#]+/video/|embed/(?:v2/)?|v/)(\d+)")
+_TIKTOK_SHORT_RE = re.compile(r"(?:https?://)?(?i:(?:vm|vt)\.tiktok\.com)/([A-Za-z0-9]+)")
+_INSTAGRAM_RE = re.compile(r"(?:https?://)?(?:[\w-]+\.)?(?i:instagram\.com)/(?:[\w.]+/)?(?:reels?|p|tv)/([A-Za-z0-9_-]+)")
+
+_ALL_PATTERNS = (_YOUTUBE_RE, _TIKTOK_RE, _TIKTOK_SHORT_RE, _INSTAGRAM_RE)
+# pattern -> (platform, prefix of the canonical id)
+_PATTERN_RESULT = {
+    _YOUTUBE_RE: ("YouTube", ""),
+    _TIKTOK_RE: ("TikTok", ""),
+    _TIKTOK_SHORT_RE: ("TikTok", "short:"),
+    _INSTAGRAM_RE: ("Instagram", ""),
+}
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonicalize_url(url: str) -> Optional[Tuple[str, str]]:
+    """Return (platform, canonical_id) for a video URL, or None if unrecognized
+
+    youtu.be/X, youtube.com/shorts/X and watch?v=X&t=3 all map to ("YouTube", "X").
+    TikTok short links (vm./vt.) can't be resolved offline and keep their code.
+    """
+    url = url.strip()
+    # Cheap substring guards pick the pattern; the fallback handles odd casing
+    if "youtu" in url:
+        patterns = (_YOUTUBE_RE,)
+    elif "tiktok" in url:
+        patterns = (_TIKTOK_RE, _TIKTOK_SHORT_RE)
+    elif "instagram" in url:
+        patterns = (_INSTAGRAM_RE,)
+    else:
+        patterns = _ALL_PATTERNS
+
+    for pattern in patterns:
+        match = pattern.match(url)
+        if match:
+            platform, prefix = _PATTERN_RESULT[pattern]
+            return (platform, prefix + match.group(1))
+    return None
+
+def canonicalize_urls(urls: Iterable[str]) -> List[Optional[Tuple[str, str]]]:
+    """Batch version of canonicalize_url"""
+    return [canonicalize_url(url) for url in urls]
+
 def extract_video_id(url: str, platform: str) -> str:
     """Extract video ID from different platform URLs"""
-    try:
-        if platform == "YouTube":
-            if "youtube.com/shorts/" in url:
-                return url.split("shorts/")[1].split("?")[0]
-            elif "youtu.be/" in url:
-                return url.split("youtu.be/")[1].split("?")[0]
-            elif "v=" in url:
-                return url.split("v=")[1].split("&")[0]
-        elif platform == "TikTok":
-            if "tiktok.com/@" in url and "/video/" in url:
-                parts = url.split("/video/")
-                if len(parts) > 1:
-                    return parts[1].split("?")[0]
-            elif "vm.tiktok.com/" in url:
-                # For short TikTok URLs, we'll use the full URL
-                return url
-            elif "tiktok.com/" in url and "/video/" in url:
-                return url.split("/video/")[1].split("/")[0].split("?")[0]
-        elif platform == "Instagram":
-            if "instagram.com/reel/" in url:
-                return url.split("reel/")[1].split("/")[0].split("?")[0]
-            elif "instagram.com/p/" in url:
-                return url.split("p/")[1].split("/")[0].split("?")[0]
-    except:
-        pass
-    return ""
+    key = canonicalize_url(url)
+    if not key or key[0] != platform:
+        return ""
+    if key[1].startswith("short:"):
+        # For short TikTok URLs, we'll use the full URL
+        return url
+    return key[1]
 
 def get_embed_url(url: str, platform: str) -> str:
     """Convert URL to embeddable format"""
     video_id = extract_video_id(url, platform)
-    
+
     if platform == "YouTube":
         return f"https://www.youtube.com/embed/{video_id}?autoplay=1"
     elif platform == "TikTok":
@@ -48,16 +92,42 @@ def get_embed_url(url: str, platform: str) -> str:
     return url
 
 def get_user_id_from_init_data(init_data: str):
-    """Extract user ID from Telegram WebApp initData"""
-    try:
-        import urllib.parse
-        import json
-        parsed = urllib.parse.parse_qs(init_data)
-        if 'user' in parsed:
-            user_data = json.loads(parsed['user'][0])
-            return user_data.get('id')
-    except Exception as e:
-        # We'll import logging only when needed to avoid circular imports
-        import logging
-        logging.getLogger("yitio_bot").error(f"Error parsing initData: {e}")
-    return None
+    """User ID from Telegram WebApp initData, or None unless its signature checks out"""
+    # Imported here: telegram_auth needs shared, which utils must not import
+    from telegram_auth import init_data_verifier
+    data = init_data_verifier.verify(init_data)
+    return data.user_id if data else None
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Supabase timestamp (ISO 8601, "Z" or offset) as naive UTC, or None"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError as e:
+            logger.error(f"Date parsing error: {e}")
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def premium_expiry(row: Optional[dict], now: Optional[datetime] = None) -> Optional[datetime]:
+    """Active premium expiry (naive UTC) of a users row
+
+    None for unknown, free or lapsed users. is_premium may come back from
+    Supabase or the replica as a bool, "true"/"false" or 0/1.
+    """
+    if not row:
+        return None
+    is_premium = row.get("is_premium")
+    if isinstance(is_premium, str):
+        is_premium = is_premium.lower() == "true"
+    if not is_premium:
+        return None
+    expires_at = parse_timestamp(row.get("premium_expires_at"))
+    if expires_at is None or expires_at <= (now or datetime.utcnow()):
+        return None
+    return expires_at
@@ -9,11 +9,14 @@ import logging
 from datetime import datetime
 from typing import Optional
 
-import httpx
 from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import JSONResponse
 from aiogram import types
 
 from shared import bot, dp, logger, WEBHOOK_URL, WEBHOOK_SECRET_TOKEN
+from update_queue import update_queue, QueueFullError, WEBHOOK_MODE
+from dedup import update_dedup
+from http_clients import http_clients
 
 router = APIRouter()
 
@@ -64,6 +67,26 @@ async def _handle_webhook_internal(request: Request):
         data = await request.json()
         update = types.Update(**data)
         
+        # Telegram redelivers slow updates; handle each update_id once
+        if not update_dedup.check_and_add(update.update_id):
+            logger.info(f"Dropped duplicate update {update.update_id}")
+            return {"ok": True}
+        
+        # Queue mode: ack right away, a background worker runs the handlers
+        if WEBHOOK_MODE == "queue" and update_queue.running:
+            try:
+                await update_queue.put(update)
+            except QueueFullError as e:
+                # Non-2xx makes Telegram redeliver later instead of us dropping it
+                logger.warning(f"Webhook backpressure: {e}")
+                update_dedup.forget(update.update_id)
+                return JSONResponse(
+                    status_code=503,
+                    content={"ok": False, "error": "busy"},
+                    headers={"Retry-After": "5"}
+                )
+            return {"ok": True}
+        
         # Process update
         await dp.feed_update(bot, update)
         
@@ -101,10 +124,9 @@ async def _set_webhook_internal():
         
         # Test webhook immediately
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                base_url = webhook_url.replace("/api/telegram-webhook", "")
-                response = await client.get(f"{base_url}/health")
-                logger.info(f"✅ Health check response: {response.status_code}")
+            base_url = webhook_url.replace("/api/telegram-webhook", "")
+            async with http_clients.request("default", "GET", f"{base_url}/health") as response:
+                logger.info(f"✅ Health check response: {response.status}")
         except Exception as e:
             logger.warning(f"⚠️ Could not test health endpoint: {e}")
         